@@ -0,0 +1,38 @@
+"""Netease lyrics-to-song crawler.
+
+Submodules are imported lazily, so `import lyrics2song` stays cheap and the
+CLI only loads what the chosen command needs:
+
+- ids, metadata: canonical deduplicated song ID lists and the memory-mapped
+  metadata index
+- api, api_pool: /lyric and /song/url calls over a pool of API servers
+- lyrics, dedup: the lyric quality filter and near-duplicate lyric detection
+- download, integrity, quality, staging, admission: song downloads,
+  checksums, bitrate policy, the local staging directory and disk admission
+- probe, manifest: header-only audio probing against lyric timings and the
+  incremental training manifest
+- state, context, writer: per-song state store, shared per-run resources
+  and the background file writer
+- profiling, tracing: the --profile stack sampler and per-stage timers, and
+  per-song lifecycle traces
+- extract, fetch_lyrics, fetch_urls, download_missing, pipeline: the phases
+- cluster: lease-based work sharing between nodes
+- cli: the `python3 -m lyrics2song` command line
+"""
+import importlib
+
+_LAZY_ATTRS = {
+    'PipelineContext': 'context',
+    'get_song_lyric': 'api',
+    'get_song_url': 'api',
+    'is_good_lyric': 'lyrics',
+    'download_song': 'download',
+    'load_song_ids': 'ids',
+    'MetadataIndex': 'metadata',
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,130 @@
+"""Admission control for downloads based on free disk space and write throughput."""
+import time
+import shutil
+import threading
+
+from .retry import Deferred
+
+MIN_FREE_BYTES = 10 * 1024**3  # free space kept on every volume downloads write to
+DISK_POLL_INTERVAL = 5  # seconds between shutil.disk_usage calls; also the deferral delay
+WRITE_BACKLOG_SECONDS = 30  # in-flight download bytes allowed, in seconds of observed throughput
+MIN_IN_FLIGHT_BYTES = 64 * 1024**2  # always admit this much, whatever the throughput
+DEFAULT_SONG_SIZE = 8 * 1024**2  # reservation for songs whose size the API did not report
+THROUGHPUT_WINDOW = 2  # seconds of completed writes per throughput sample
+THROUGHPUT_SMOOTHING = 0.3  # weight of the newest throughput sample
+
+class DownloadAdmission:
+    """Decide whether a download may start now.
+
+    Every admitted download reserves its expected size. A download is
+    deferred when the reservations would leave less than min_free_bytes on
+    any of the watched volumes, or when the bytes in flight exceed what the
+    disks have been absorbing over the last backlog_seconds. Deferred songs
+    go back on the retry queue, so workers keep fetching lyrics while the
+    download stage is paused."""
+
+    def __init__(self, paths, min_free_bytes=MIN_FREE_BYTES, backlog_seconds=WRITE_BACKLOG_SECONDS,
+                 poll_interval=DISK_POLL_INTERVAL):
+        self.paths = list(paths)
+        self.min_free_bytes = min_free_bytes
+        self.backlog_seconds = backlog_seconds
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.reserved = 0
+        self.in_flight = 0
+        self.free = None
+        self.polled_at = 0.0
+        self.written_since_poll = 0
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.throughput = None  # bytes per second, smoothed
+        self.average_size = DEFAULT_SONG_SIZE
+        self.paused_since = None
+        self.paused_total = 0.0
+        self.deferrals = 0
+
+    def _free_bytes(self):
+        now = time.monotonic()
+        if self.free is None or now - self.polled_at >= self.poll_interval:
+            self.free = min(shutil.disk_usage(path).free for path in self.paths)
+            self.polled_at = now
+            self.written_since_poll = 0
+        # Writes finished since the last poll are not reflected in it yet
+        return self.free - self.written_since_poll
+
+    def _pressure(self, size):
+        """Why a download of size bytes cannot start now, or None."""
+        free = self._free_bytes()
+        if free - self.reserved - size < self.min_free_bytes:
+            return f"{free / 1024**3:.1f} GiB free, {self.reserved / 1024**2:.0f} MB reserved"
+        if self.in_flight and self.throughput is not None:
+            allowed = max(MIN_IN_FLIGHT_BYTES, self.throughput * self.backlog_seconds)
+            if self.reserved + size > allowed:
+                return f"{self.reserved / 1024**2:.0f} MB in flight at {self.throughput / 1024**2:.1f} MB/s"
+        return None
+
+    def _defer(self, song_id, reason):
+        self.deferrals += 1
+        if self.paused_since is None:
+            self.paused_since = time.monotonic()
+            print(f"Pausing downloads: {reason}")
+        raise Deferred(f"download of song {song_id} deferred: {reason}", self.poll_interval)
+
+    def _resume(self):
+        if self.paused_since is not None:
+            paused = time.monotonic() - self.paused_since
+            self.paused_total += paused
+            self.paused_since = None
+            print(f"Resuming downloads after {paused:.0f}s")
+
+    def check(self, song_id):
+        """Raise Deferred if a typical download could not start now.
+
+        Called before resolving a URL, so paused downloads do not spend
+        /song/url requests."""
+        with self.lock:
+            reason = self._pressure(self.average_size)
+            if reason:
+                self._defer(song_id, reason)
+
+    def reserve(self, song_id, size):
+        """Reserve space for a download or raise Deferred. Returns the reserved bytes."""
+        size = size or self.average_size
+        with self.lock:
+            reason = self._pressure(size)
+            if reason:
+                self._defer(song_id, reason)
+            self._resume()
+            self.reserved += size
+            self.in_flight += 1
+        return size
+
+    def release(self, reserved, written):
+        """Return a reservation once its download finished or failed."""
+        now = time.monotonic()
+        with self.lock:
+            self.reserved -= reserved
+            self.in_flight -= 1
+            if not written:
+                return
+            self.written_since_poll += written
+            self.average_size += THROUGHPUT_SMOOTHING * (written - self.average_size)
+            self.window_bytes += written
+            elapsed = now - self.window_start
+            if elapsed >= THROUGHPUT_WINDOW:
+                sample = self.window_bytes / elapsed
+                if self.throughput is None:
+                    self.throughput = sample
+                else:
+                    self.throughput += THROUGHPUT_SMOOTHING * (sample - self.throughput)
+                self.window_start = now
+                self.window_bytes = 0
+
+    def summary(self):
+        with self.lock:
+            paused = self.paused_total
+            if self.paused_since is not None:
+                paused += time.monotonic() - self.paused_since
+            throughput = f"{self.throughput / 1024**2:.1f} MB/s" if self.throughput else "n/a"
+            return [f"Download admission: {self.deferrals} deferrals, paused {paused:.0f}s, "
+                    f"write throughput {throughput}"]
@@ -0,0 +1,76 @@
+"""Calls to the NeteaseCloudMusicApi /lyric and /song/url endpoints.
+
+Each call makes a single attempt. Transient failures raise RetryLater so
+the caller can put the song on the delayed-retry queue instead of
+sleeping in the worker thread."""
+import time
+
+from .config import API_TIMEOUT, URL_TTL, URL_REFRESH_MARGIN
+from .profiling import stage
+from .retry import RetryLater
+
+def _get_json(api, path, params, what):
+    try:
+        with stage(f"request {path}"):
+            response = api.get(path, params=params, timeout=API_TIMEOUT)
+    except Exception as e:
+        raise RetryLater(f"error fetching {what}: {e}", path) from e
+    if response.status_code != 200:
+        raise RetryLater(f"failed to fetch {what}, status: {response.status_code}", path)
+    try:
+        with stage(f"decode {path}"):
+            return response.json()
+    except ValueError as e:
+        raise RetryLater(f"invalid JSON for {what}: {e}", path) from e
+
+def get_song_lyric(song_id, api):
+    """Fetch the lyrics for a song. Returns None if the API has none."""
+    data = _get_json(api, '/lyric', {'id': song_id}, f"lyrics for song {song_id}")
+    if data['code'] == 200:
+        return data
+    else:
+        return None
+
+def get_song_url(song_id, api, quality, no_url_ids=None):
+    """Fetch the download URL for a song.
+
+    Songs without a URL are added to no_url_ids when it is given, and
+    skipped if they are already in it."""
+    # Skip if we already know this has no URL
+    if no_url_ids is not None and song_id in no_url_ids:
+        return None
+
+    br = quality.max_br
+    while True:
+        data = _get_json(api, '/song/url', {'id': song_id, 'br': br}, f"URL for song {song_id}")
+        if not (data['code'] == 200 and data['data'] and data['data'][0]['url']):
+            print(f"No URL available for song {song_id}")
+            if no_url_ids is not None:
+                no_url_ids.add(song_id)
+            return None
+
+        song_data = data['data'][0]
+        lower_br = quality.downgrade(song_data, br)
+        if not lower_br:
+            break
+        # Not a preferred format: ask for a lower tier instead
+        br = lower_br
+
+    fetched_at = time.time()
+    return {
+        'id': song_id,
+        'url': song_data['url'],
+        'size': song_data.get('size'),
+        'type': song_data.get('type'),
+        'br': song_data.get('br'),
+        'md5': song_data.get('md5'),
+        'fetched_at': fetched_at,
+        'expires_at': fetched_at + (song_data.get('expi') or URL_TTL)
+    }
+
+def url_is_stale(song_data, margin=URL_REFRESH_MARGIN):
+    """Check whether a URL record is expired or about to expire.
+
+    Records without an expiry (older checkpoints) are always stale."""
+    expires_at = song_data.get('expires_at')
+    return expires_at is None or expires_at - margin <= time.time()
@@ -0,0 +1,145 @@
+"""Least-loaded balancing over several API server instances."""
+import time
+import threading
+import requests
+
+# Constants
+HEALTH_CHECK_INTERVAL = 10  # seconds between health checks
+HEALTH_CHECK_PATH = '/'  # NeteaseCloudMusicApi serves its index page here
+HEALTH_CHECK_TIMEOUT = 5
+MAX_CONSECUTIVE_FAILURES = 5  # failures in a row before an instance is ejected
+
+class ApiInstance:
+    """One API server in the pool and its request statistics."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_latency = 0.0
+        self.healthy = True
+        self.ejections = 0
+
+class ApiPool:
+    """Spread API requests over several NeteaseCloudMusicApi instances.
+
+    Each request goes to the healthy instance with the fewest requests in
+    flight. An instance that fails MAX_CONSECUTIVE_FAILURES times in a row
+    (requests and health checks alike) is ejected until a background health
+    check sees it answer again. If every instance is ejected, requests still
+    go out so the pipeline keeps probing instead of stalling."""
+
+    def __init__(self, base_urls, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 max_failures=MAX_CONSECUTIVE_FAILURES):
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        if not base_urls:
+            raise ValueError("ApiPool needs at least one API base URL")
+        self.instances = [ApiInstance(url) for url in base_urls]
+        self.max_failures = max_failures
+        self.health_check_interval = health_check_interval
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.health_thread = None
+        if len(self.instances) > 1:
+            self.health_thread = threading.Thread(target=self._health_loop, name='api-health', daemon=True)
+            self.health_thread.start()
+
+    def _acquire(self):
+        with self.lock:
+            candidates = [inst for inst in self.instances if inst.healthy] or self.instances
+            instance = min(candidates, key=lambda inst: (inst.in_flight, inst.requests))
+            instance.in_flight += 1
+            instance.requests += 1
+        return instance
+
+    def _release(self, instance, ok, latency):
+        with self.lock:
+            instance.in_flight -= 1
+            instance.total_latency += latency
+            if ok:
+                instance.consecutive_failures = 0
+                if not instance.healthy:
+                    print(f"API instance {instance.base_url} is answering again")
+                    instance.healthy = True
+                return
+            instance.failures += 1
+            self._count_failure(instance)
+
+    def _count_failure(self, instance):
+        """Count a failed request or health check; eject after max_failures in a row. Needs self.lock."""
+        instance.consecutive_failures += 1
+        if instance.healthy and instance.consecutive_failures >= self.max_failures:
+            instance.healthy = False
+            instance.ejections += 1
+            print(f"Ejecting API instance {instance.base_url} after "
+                  f"{instance.consecutive_failures} consecutive failures")
+
+    def get(self, path, params=None, timeout=10):
+        """GET path from the least-loaded instance and return the response.
+
+        Connection errors and 5xx responses count against the instance;
+        exceptions are re-raised for the caller's retry logic."""
+        instance = self._acquire()
+        start = time.time()
+        ok = False
+        try:
+            response = instance.session.get(f"{instance.base_url}{path}", params=params, timeout=timeout)
+            ok = response.status_code < 500
+            return response
+        finally:
+            self._release(instance, ok, time.time() - start)
+
+    def _health_loop(self):
+        while not self.stop_event.wait(self.health_check_interval):
+            for instance in self.instances:
+                try:
+                    response = requests.get(f"{instance.base_url}{HEALTH_CHECK_PATH}",
+                                            timeout=HEALTH_CHECK_TIMEOUT)
+                    alive = response.status_code < 500
+                except Exception:
+                    alive = False
+                with self.lock:
+                    if not alive:
+                        # One slow check under load is no reason to eject an instance
+                        self._count_failure(instance)
+                        continue
+                    # Only failures in a row count, also when no requests come in between
+                    instance.consecutive_failures = 0
+                    if not instance.healthy:
+                        print(f"API instance {instance.base_url} is healthy again")
+                        instance.healthy = True
+
+    def stats(self):
+        """Return per-instance statistics as a list of dicts."""
+        with self.lock:
+            return [{
+                'base_url': inst.base_url,
+                'healthy': inst.healthy,
+                'in_flight': inst.in_flight,
+                'requests': inst.requests,
+                'failures': inst.failures,
+                'ejections': inst.ejections,
+                'avg_latency': inst.total_latency / inst.requests if inst.requests else 0.0,
+            } for inst in self.instances]
+
+    def summary(self):
+        """Human-readable lines with per-instance statistics."""
+        return [f"{s['base_url']}: {s['requests']} requests, {s['failures']} failures, "
+                f"{s['ejections']} ejections, {s['avg_latency'] * 1000:.0f} ms avg"
+                f"{'' if s['healthy'] else ' (ejected)'}"
+                for s in self.stats()]
+
+    def close(self):
+        self.stop_event.set()
+        if self.health_thread:
+            self.health_thread.join()
+        for instance in self.instances:
+            instance.session.close()
+
+def parse_base_urls(values):
+    """Flatten --api-base-url values, which may each be comma-separated."""
+    return [url.strip() for value in values for url in value.split(',') if url.strip()]
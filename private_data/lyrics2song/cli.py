@@ -0,0 +1,450 @@
+"""Command-line interface: python3 -m lyrics2song run|lyrics|urls|download|extract|ids|verify|probe|manifest|metadata|cluster|trace.
+
+Phase modules are imported inside the command handlers so that the CLI
+starts without loading requests, tqdm or the ID lists it does not need."""
+import os
+import sys
+import json
+import time
+import argparse
+
+from . import config
+
+def _print_phase(description):
+    print(f"\n{'='*80}")
+    print(f"PHASE: {description}")
+    print(f"{'='*80}\n")
+
+def _run_phase(description, func, *args, **kwargs):
+    """Run one phase in-process, timing it like the old per-script runner."""
+    _print_phase(description)
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    duration = time.time() - start_time
+    print(f"\nCompleted {description} in {duration:.2f} seconds")
+    return result
+
+def _make_context(args):
+    from .context import PipelineContext
+    from .api_pool import parse_base_urls
+    from .quality import QualityPolicy, parse_formats
+
+    quality = QualityPolicy(args.max_br, parse_formats(args.formats))
+    high_watermark = int(args.staging_high_watermark * 1024**3) if args.staging_high_watermark else None
+    min_free = int(args.min_free_gb * 1024**3) if args.min_free_gb is not None else None
+    return PipelineContext(args.output_dir, parse_base_urls(args.api_base_url), quality,
+                           args.staging_dir, high_watermark, min_free, args.fsync)
+
+def _finish_profile(profiler, args, ctx):
+    profiler.stop()
+    output = args.profile_output or ctx.path(config.PROFILE_FILE)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    profiler.write_folded(output)
+    print(f"\nProfile Results:")
+    for line in profiler.summary():
+        print(f"- {line}" if not line.startswith(' ') else line)
+    print(f"- Folded stacks written to {output} (flamegraph.pl, speedscope or inferno can render them)")
+
+def _english_ids_file(args, ctx):
+    """--english-ids-file, else the merged list built by `ids`, else the old text list."""
+    if args.english_ids_file:
+        return args.english_ids_file
+    merged = ctx.path(config.CANONICAL_IDS_FILE)
+    return merged if os.path.exists(merged) else ctx.path(config.ENGLISH_IDS_FILE)
+
+def _trace_file(args, ctx):
+    if not args.trace:
+        return None
+    return ctx.path(config.TRACE_FILE) if args.trace is True else args.trace
+
+def cmd_extract(args, ctx):
+    from .extract import process_metadata_files
+    _run_phase("Extracting English song IDs", process_metadata_files, ctx, args.metadata_path)
+    return 0
+
+def cmd_lyrics(args, ctx):
+    from .fetch_lyrics import fetch_and_filter_lyrics
+    good_ids = _run_phase("Fetching and filtering lyrics", fetch_and_filter_lyrics,
+                          ctx, _english_ids_file(args, ctx), args.workers or config.LYRIC_WORKERS,
+                          args.skip_new)
+    return 0 if good_ids is not None else 2
+
+def cmd_urls(args, ctx):
+    from .fetch_urls import fetch_and_download_songs
+    songs_data = _run_phase("Fetching URLs and downloading songs with good lyrics",
+                            fetch_and_download_songs, ctx, None, args.workers or config.URL_WORKERS)
+    return 0 if songs_data is not None else 3
+
+def cmd_download(args, ctx):
+    from .download_missing import download_missing_songs
+    _run_phase("Downloading missing songs", download_missing_songs,
+               ctx, args.urls_file, args.workers or config.DOWNLOAD_WORKERS)
+    return 0
+
+def cmd_run(args, ctx):
+    os.makedirs(ctx.output_dir, exist_ok=True)
+
+    if args.start_phase <= 1:
+        from .extract import process_metadata_files
+        _run_phase("Extracting English song IDs", process_metadata_files, ctx, args.metadata_path)
+
+    # Use combined pipeline if requested
+    if args.combined:
+        from .pipeline import combined_pipeline
+        ok = _run_phase("Running combined lyrics and song download pipeline", combined_pipeline,
+                        ctx, _english_ids_file(args, ctx), args.workers or config.PIPELINE_WORKERS,
+                        args.speculative_url_threshold, args.dedup_lyrics, args.max_lyric_copies,
+                        _trace_file(args, ctx), args.trace_sample)
+        if not ok:
+            return 2
+        print("\n" + "="*80)
+        print("Combined pipeline completed successfully!")
+        print(f"Songs with good lyrics have been downloaded to {ctx.output_dir}")
+        print("="*80)
+        return 0
+
+    # Phase 2: Fetch and filter lyrics
+    good_ids = None
+    if args.start_phase <= 2:
+        from .fetch_lyrics import fetch_and_filter_lyrics
+        good_ids = _run_phase("Fetching and filtering lyrics", fetch_and_filter_lyrics,
+                              ctx, _english_ids_file(args, ctx), args.workers or config.LYRIC_WORKERS)
+        if good_ids is None:
+            return 2
+
+    # Phase 3: Fetch song URLs and download songs for songs with good lyrics
+    if args.start_phase <= 3:
+        from .fetch_urls import fetch_and_download_songs
+        songs_data = _run_phase("Fetching URLs and downloading songs with good lyrics",
+                                fetch_and_download_songs, ctx, good_ids, args.workers or config.URL_WORKERS)
+        if songs_data is None:
+            return 3
+
+    print("\n" + "="*80)
+    print("All phases completed successfully!")
+    print(f"Songs with good lyrics have been downloaded to {ctx.output_dir}")
+    print("="*80)
+    return 0
+
+def cmd_ids(args, ctx):
+    import glob
+    from .ids import sorted_unique_ids, write_id_list
+
+    inputs = args.inputs or sorted(glob.glob(os.path.join(config.ID_LIST_DIR, 'part_*.txt')))
+    if not inputs:
+        print("Error: no ID files to merge.")
+        return 1
+
+    output = args.output or ctx.path(config.CANONICAL_IDS_FILE)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    print(f"Merging {len(inputs)} ID files into {output}...")
+    count = write_id_list(output, sorted_unique_ids(inputs, args.run_size, args.tmp_dir))
+    print(f"Wrote {count} unique song IDs to {output}")
+    return 0
+
+def cmd_verify(args, ctx):
+    from .integrity import verify_songs, STATUS_OK, STATUS_UNVERIFIED, STATUS_MISMATCH
+
+    counts = verify_songs(ctx.songs_dir, ctx.state, args.workers)
+
+    print(f"\nVerification Results:")
+    print(f"- Matching checksum: {counts[STATUS_OK]}")
+    print(f"- No checksum to compare: {counts[STATUS_UNVERIFIED]}")
+    print(f"- Checksum mismatch: {counts[STATUS_MISMATCH]}")
+    return 1 if counts[STATUS_MISMATCH] else 0
+
+def cmd_probe(args, ctx):
+    from .probe import probe_songs, PROBE_OK, PROBE_TOO_SHORT, PROBE_UNREADABLE, PROBE_NO_LYRIC
+
+    counts = _run_phase("Probing downloaded songs", probe_songs,
+                        ctx.songs_dir, ctx.lyrics_dir, ctx.state, args.workers, args.reprobe)
+
+    print(f"\nProbe Results:")
+    print(f"- Duration covers the lyrics: {counts[PROBE_OK]}")
+    print(f"- Shorter than the lyrics: {counts[PROBE_TOO_SHORT]}")
+    print(f"- Unreadable: {counts[PROBE_UNREADABLE]}")
+    print(f"- No lyric timing to compare: {counts[PROBE_NO_LYRIC]}")
+    return 1 if counts[PROBE_TOO_SHORT] or counts[PROBE_UNREADABLE] else 0
+
+def cmd_manifest(args, ctx):
+    from .manifest import export_manifest
+    ctx.ensure_dirs()
+    exported = _run_phase("Exporting training manifest", export_manifest, ctx, args.manifest_dir,
+                          args.shard_size, args.format, args.workers, args.include_flagged)
+    print(f"Exported {exported} new songs")
+    return 0
+
+def cmd_metadata(args, ctx):
+    index_path = args.index or ctx.path(config.METADATA_INDEX_FILE)
+    if args.action == 'build':
+        from .metadata import build_metadata_index
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        count = _run_phase("Building metadata index", build_metadata_index,
+                           args.metadata_path, index_path, args.workers)
+        print(f"Indexed {count} songs in {index_path}")
+        return 0
+
+    from .metadata import MetadataIndex
+    if not os.path.exists(index_path):
+        print(f"Error: metadata index {index_path} not found. Run the metadata build command first.")
+        return 1
+    index = MetadataIndex(index_path)
+    try:
+        if args.action == 'lookup':
+            missing = 0
+            for song_id in args.song_ids:
+                record = index.lookup(song_id)
+                if record is None:
+                    missing += 1
+                    print(f"{song_id}: not indexed")
+                else:
+                    print(json.dumps(record, ensure_ascii=False))
+            return 1 if missing else 0
+
+        min_ms = int(args.min_duration * 1000) if args.min_duration is not None else None
+        max_ms = int(args.max_duration * 1000) if args.max_duration is not None else None
+        song_ids = index.scan(args.language, min_ms, max_ms)
+        if args.output:
+            with open(args.output, 'w') as f:
+                for song_id in song_ids:
+                    f.write(f"{song_id}\n")
+            print(f"Wrote {len(song_ids)} of {len(index)} song IDs to {args.output}")
+        else:
+            for song_id in song_ids:
+                print(song_id)
+        return 0
+    finally:
+        index.close()
+
+def cmd_cluster(args, ctx):
+    from .cluster import WorkCoordinator, run_node
+
+    coordinator_path = args.coordinator or ctx.path(config.COORDINATOR_FILE)
+    os.makedirs(os.path.dirname(os.path.abspath(coordinator_path)), exist_ok=True)
+    coordinator = WorkCoordinator(coordinator_path, args.node_id, args.lease_seconds)
+    try:
+        if args.action == 'seed':
+            english_ids_file = _english_ids_file(args, ctx)
+            if not os.path.exists(english_ids_file):
+                print(f"Error: English song IDs file {english_ids_file} not found.")
+                return 1
+            song_ids = ctx.song_ids(english_ids_file)
+            added = coordinator.seed(song_ids)
+            print(f"Added {added} of {len(song_ids)} songs to {coordinator_path}")
+        elif args.action == 'run':
+            _run_phase(f"Running node {coordinator.node_id}", run_node, ctx, coordinator,
+                       args.batch_size, args.workers or config.PIPELINE_WORKERS)
+
+        counts = coordinator.counts()
+        print(f"\nCoordinator {coordinator_path}:")
+        for status, count in counts.items():
+            print(f"- {status}: {count}")
+        for node, count in sorted(coordinator.node_counts().items(), key=lambda item: str(item[0])):
+            print(f"- done by {node}: {count}")
+        return 0
+    finally:
+        coordinator.close()
+
+def cmd_trace(args, ctx):
+    from .tracing import analyze_trace
+
+    trace_path = args.trace_file or ctx.path(config.TRACE_FILE)
+    if not os.path.exists(trace_path):
+        print(f"Error: trace file {trace_path} not found. Record one with run --combined --trace.")
+        return 1
+    print(f"Trace Analysis of {trace_path}:")
+    for line in analyze_trace(trace_path, args.slowest):
+        print(line)
+    return 0
+
+def build_parser():
+    from .ids import RUN_SIZE
+    from .quality import DEFAULT_MAX_BR, DEFAULT_FORMATS
+    from .writer import FSYNC_POLICIES
+    from .dedup import DEDUP_MODES, DEFAULT_MAX_COPIES
+    from .manifest import MANIFEST_FORMATS, MANIFEST_WORKERS, SHARD_SIZE
+    from .cluster import CLAIM_BATCH, LEASE_SECONDS
+    from .profiling import PROFILE_HZ
+    from .tracing import SLOWEST_SONGS
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output-dir', type=str, default=config.OUTPUT_DIR,
+                        help='Directory to store all data')
+    common.add_argument('--api-base-url', type=str, nargs='+', default=config.API_BASE_URLS,
+                        help='Base URL(s) for the API; requests are balanced across all of them')
+    common.add_argument('--max-br', type=int, default=DEFAULT_MAX_BR,
+                        help='Highest bitrate to request from /song/url (e.g. 128000, 192000, 320000)')
+    common.add_argument('--formats', type=str, default=','.join(DEFAULT_FORMATS),
+                        help='Comma-separated preferred audio formats')
+    common.add_argument('--staging-dir', type=str, default=None,
+                        help='Local (SSD) directory to download into; finished files are moved to '
+                             'the songs directory in sequential batches')
+    common.add_argument('--staging-high-watermark', type=float, default=None,
+                        help='GiB allowed in the staging directory before downloads wait for the mover')
+    common.add_argument('--min-free-gb', type=float, default=None,
+                        help='Free space (GiB) to keep on the download volumes; downloads pause below it')
+    common.add_argument('--fsync', choices=FSYNC_POLICIES, default='none',
+                        help='When lyric files and ID checkpoints are fsynced: never, once per write batch, '
+                             'or after every file')
+    common.add_argument('--profile', action='store_true',
+                        help='Sample thread stacks and time pipeline stages; prints a report at the end')
+    common.add_argument('--profile-hz', type=float, default=PROFILE_HZ,
+                        help='Stack samples per second with --profile; 10 or less for long production runs')
+    common.add_argument('--profile-output', type=str,
+                        help='Folded-stack file for flame graphs (default: <output-dir>/profile.folded)')
+
+    parser = argparse.ArgumentParser(prog='lyrics2song', description='Run Netease music download pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', parents=[common], help='Run the full pipeline')
+    run_parser.add_argument('--start-phase', type=int, default=1, choices=[1, 2, 3],
+                            help='Start from phase number (1: Extract IDs, 2: Fetch Lyrics, 3: Fetch URLs and Download)')
+    run_parser.add_argument('--combined', action='store_true',
+                            help='Use the combined pipeline for lyrics and song downloads')
+    run_parser.add_argument('--english-ids-file', type=str,
+                            help='Path to file containing English song IDs (default: the merged list from the ids '
+                                 'command, else english_song_ids_800k.txt)')
+    run_parser.add_argument('--metadata-path', type=str, default=config.METADATA_PATH,
+                            help='Directory containing the metadata_package batches')
+    run_parser.add_argument('--workers', type=int, help='Number of worker threads')
+    run_parser.add_argument('--speculative-url-threshold', type=float, default=None,
+                            help='With --combined, look up song URLs alongside the lyric fetch for songs '
+                                 'whose estimated chance of good lyrics is at least this (0-1)')
+    run_parser.add_argument('--dedup-lyrics', choices=DEDUP_MODES, default=None,
+                            help='With --combined, detect near-duplicate lyrics (covers, re-uploads) and '
+                                 'flag, skip or defer downloads past --max-lyric-copies')
+    run_parser.add_argument('--max-lyric-copies', type=int, default=DEFAULT_MAX_COPIES,
+                            help='Songs downloaded per distinct lyric when --dedup-lyrics is set')
+    run_parser.add_argument('--trace', nargs='?', const=True, default=None, metavar='FILE',
+                            help='With --combined, append per-song lifecycle traces to FILE '
+                                 '(default: <output-dir>/song_traces.jsonl)')
+    run_parser.add_argument('--trace-sample', type=float, default=1.0,
+                            help='Fraction of songs traced with --trace (e.g. 0.01)')
+    run_parser.set_defaults(handler=cmd_run)
+
+    extract_parser = subparsers.add_parser('extract', parents=[common], help='Extract English song IDs')
+    extract_parser.add_argument('--metadata-path', type=str, default=config.METADATA_PATH,
+                                help='Directory containing the metadata_package batches')
+    extract_parser.set_defaults(handler=cmd_extract)
+
+    lyrics_parser = subparsers.add_parser('lyrics', parents=[common], help='Fetch and filter lyrics')
+    lyrics_parser.add_argument('--english-ids-file', type=str,
+                               help='Path to file containing English song IDs (default: the merged list from the ids '
+                                    'command, else english_song_ids_800k.txt)')
+    lyrics_parser.add_argument('--skip-new', action='store_true',
+                               help='Only collect existing lyric files, fetch nothing new')
+    lyrics_parser.add_argument('--workers', type=int, help='Number of worker threads')
+    lyrics_parser.set_defaults(handler=cmd_lyrics)
+
+    urls_parser = subparsers.add_parser('urls', parents=[common],
+                                        help='Fetch URLs and download songs with good lyrics')
+    urls_parser.add_argument('--workers', type=int, help='Number of worker threads')
+    urls_parser.set_defaults(handler=cmd_urls)
+
+    download_parser = subparsers.add_parser('download', parents=[common],
+                                            help='Download songs missing from the URL checkpoint')
+    download_parser.add_argument('--urls-file', type=str, help='URL checkpoint JSON file')
+    download_parser.add_argument('--workers', type=int, help='Number of worker threads')
+    download_parser.set_defaults(handler=cmd_download)
+
+    ids_parser = subparsers.add_parser('ids', parents=[common],
+                                       help='Build a canonical, deduplicated song ID list')
+    ids_parser.add_argument('inputs', nargs='*',
+                            help='Text ID files to merge (default: english_song_ids_list/part_*.txt)')
+    ids_parser.add_argument('-o', '--output', type=str,
+                            help='Path of the canonical binary ID list to write')
+    ids_parser.add_argument('--run-size', type=int, default=RUN_SIZE,
+                            help='IDs sorted in memory per run before spilling to disk')
+    ids_parser.add_argument('--tmp-dir', type=str, default=None,
+                            help='Directory for temporary sort runs')
+    ids_parser.set_defaults(handler=cmd_ids)
+
+    verify_parser = subparsers.add_parser('verify', parents=[common],
+                                          help='Re-hash downloaded songs and record the results')
+    verify_parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                               help='Number of hashing processes')
+    verify_parser.set_defaults(handler=cmd_verify)
+
+    probe_parser = subparsers.add_parser('probe', parents=[common],
+                                         help='Read audio headers and check durations against the lyrics')
+    probe_parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                              help='Number of probing processes')
+    probe_parser.add_argument('--reprobe', action='store_true',
+                              help='Probe songs again even if they were probed at the same size')
+    probe_parser.set_defaults(handler=cmd_probe)
+
+    manifest_parser = subparsers.add_parser('manifest', parents=[common],
+                                            help='Append newly completed lyric + audio pairs to the training manifest')
+    manifest_parser.add_argument('--manifest-dir', type=str,
+                                 help='Directory for the manifest shards (default: <output-dir>/manifest)')
+    manifest_parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Songs per shard')
+    manifest_parser.add_argument('--format', choices=MANIFEST_FORMATS, default='auto',
+                                 help='Shard format; auto writes Parquet when pyarrow is installed')
+    manifest_parser.add_argument('--workers', type=int, default=MANIFEST_WORKERS,
+                                 help='Number of shard-writing processes')
+    manifest_parser.add_argument('--include-flagged', action='store_true',
+                                 help='Also export songs the probe found too short or unreadable')
+    manifest_parser.set_defaults(handler=cmd_manifest)
+
+    metadata_parser = subparsers.add_parser('metadata', parents=[common],
+                                            help='Build or query the memory-mapped song metadata index')
+    metadata_parser.add_argument('action', choices=['build', 'lookup', 'scan'],
+                                 help='build the index, look up song IDs, or scan for matching songs')
+    metadata_parser.add_argument('song_ids', nargs='*', help='Song IDs to look up')
+    metadata_parser.add_argument('--index', type=str, help='Path of the metadata index file')
+    metadata_parser.add_argument('--metadata-path', type=str, default=config.METADATA_PATH,
+                                 help='Directory containing the metadata_package batches')
+    metadata_parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                                 help='Number of JSON parsing processes')
+    metadata_parser.add_argument('--language', type=str, nargs='+',
+                                 help='Scan: keep songs with any of these languages (e.g. 英语)')
+    metadata_parser.add_argument('--min-duration', type=float, help='Scan: minimum duration in seconds')
+    metadata_parser.add_argument('--max-duration', type=float, help='Scan: maximum duration in seconds')
+    metadata_parser.add_argument('-o', '--output', type=str, help='Scan: write matching IDs to this file')
+    metadata_parser.set_defaults(handler=cmd_metadata)
+
+    cluster_parser = subparsers.add_parser('cluster', parents=[common],
+                                           help='Share the crawl between nodes through a coordinator file')
+    cluster_parser.add_argument('action', choices=['seed', 'run', 'status'],
+                                help='seed the coordinator with song IDs, run a node, or show progress')
+    cluster_parser.add_argument('--coordinator', type=str,
+                                help='Shared coordinator SQLite file (default: <output-dir>/coordinator.db)')
+    cluster_parser.add_argument('--english-ids-file', type=str,
+                                help='Seed: path to file containing English song IDs (default: the merged list '
+                                     'from the ids command, else english_song_ids_800k.txt)')
+    cluster_parser.add_argument('--node-id', type=str, help='Name of this node (default: host-pid)')
+    cluster_parser.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS,
+                                help='Seconds a claimed batch stays leased without renewal')
+    cluster_parser.add_argument('--batch-size', type=int, default=CLAIM_BATCH, help='Songs claimed per lease')
+    cluster_parser.add_argument('--workers', type=int, help='Number of worker threads')
+    cluster_parser.set_defaults(handler=cmd_cluster)
+
+    trace_parser = subparsers.add_parser('trace', parents=[common],
+                                         help='Report per-stage latency percentiles and the slowest songs of a trace')
+    trace_parser.add_argument('trace_file', nargs='?',
+                              help='Trace file written by run --trace (default: <output-dir>/song_traces.jsonl)')
+    trace_parser.add_argument('--slowest', type=int, default=SLOWEST_SONGS, help='Slowest songs to list')
+    trace_parser.set_defaults(handler=cmd_trace)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ctx = _make_context(args)
+    profiler = None
+    if args.profile:
+        from .profiling import SamplingProfiler
+        profiler = SamplingProfiler(args.profile_hz).start()
+    try:
+        return args.handler(args, ctx)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return 130
+    finally:
+        ctx.close()
+        if profiler:
+            # After close, so the final checkpoints and writes are included
+            _finish_profile(profiler, args, ctx)
+
+if __name__ == "__main__":
+    sys.exit(main())
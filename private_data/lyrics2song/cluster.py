@@ -0,0 +1,288 @@
+"""Multi-node crawling: song IDs handed out in leased batches from a shared SQLite file.
+
+Every node runs the combined pipeline on batches it claims from the
+coordinator file and writes into its own output directory. A lease has to
+be renewed while its batch is being worked on; leases of nodes that
+crashed or lost the coordinator expire and their songs are handed out
+again. Completions are fenced by lease, so a node whose lease was taken
+over cannot overwrite the new holder's result."""
+import os
+import time
+import socket
+import sqlite3
+import threading
+
+from .config import PIPELINE_WORKERS
+
+LEASE_SECONDS = 300  # a batch not renewed for this long is handed out again
+CLAIM_BATCH = 500  # songs per claim; large enough that the coordinator is rarely contended
+MAX_LEASES_PER_SONG = 3  # a song whose lease expired this often is marked failed
+IDLE_WAIT = 10  # seconds a node waits for leases of other nodes to finish or expire
+SEED_BATCH = 10000
+BUSY_TIMEOUT = 60  # seconds to wait for the coordinator's write lock
+
+# Task statuses
+TASK_PENDING = 'pending'
+TASK_LEASED = 'leased'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    song_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_id INTEGER,
+    node TEXT,
+    lease_expires REAL,
+    leases INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_lease ON tasks (lease_id);
+CREATE TABLE IF NOT EXISTS leases (
+    lease_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    node TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+def default_node_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class Lease:
+    """A batch of songs held by one node until expires_at."""
+
+    def __init__(self, lease_id, song_ids, expires_at):
+        self.lease_id = lease_id
+        self.song_ids = song_ids
+        self.expires_at = expires_at
+
+class WorkCoordinator:
+    """Task table shared by all nodes through one SQLite file.
+
+    The file may live on a shared filesystem, so it uses the rollback
+    journal rather than WAL. Every state change is one short IMMEDIATE
+    transaction."""
+
+    def __init__(self, path, node_id=None, lease_seconds=LEASE_SECONDS, max_leases=MAX_LEASES_PER_SONG):
+        self.path = path
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self, func):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(self.conn)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+
+    def seed(self, song_ids):
+        """Add song IDs as pending tasks; IDs already known are left alone. Returns the number added."""
+        added = 0
+        batch = []
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO tasks (song_id, updated_at) VALUES (?, ?)',
+                             [(song_id, time.time()) for song_id in batch])
+            return conn.total_changes - before
+
+        for song_id in song_ids:
+            batch.append(str(song_id))
+            if len(batch) >= SEED_BATCH:
+                added += self._transaction(insert)
+                batch = []
+        if batch:
+            added += self._transaction(insert)
+        return added
+
+    def _reclaim_expired(self, conn, now):
+        conn.execute('UPDATE tasks SET status = ?, updated_at = ? '
+                     'WHERE status = ? AND lease_expires < ? AND leases >= ?',
+                     (TASK_FAILED, now, TASK_LEASED, now, self.max_leases))
+        return conn.execute('UPDATE tasks SET status = ?, lease_id = NULL, node = NULL, updated_at = ? '
+                            'WHERE status = ? AND lease_expires < ?',
+                            (TASK_PENDING, now, TASK_LEASED, now)).rowcount
+
+    def claim(self, batch_size=CLAIM_BATCH):
+        """Lease up to batch_size pending songs. Returns a Lease, or None if nothing is pending."""
+        def claim_batch(conn):
+            now = time.time()
+            self._reclaim_expired(conn, now)
+            lease_id = conn.execute('INSERT INTO leases (node, created_at) VALUES (?, ?)',
+                                    (self.node_id, now)).lastrowid
+            expires_at = now + self.lease_seconds
+            conn.execute('UPDATE tasks SET status = ?, lease_id = ?, node = ?, lease_expires = ?, '
+                         'leases = leases + 1, updated_at = ? '
+                         'WHERE song_id IN (SELECT song_id FROM tasks WHERE status = ? LIMIT ?)',
+                         (TASK_LEASED, lease_id, self.node_id, expires_at, now, TASK_PENDING, batch_size))
+            song_ids = [row[0] for row in conn.execute('SELECT song_id FROM tasks WHERE lease_id = ?',
+                                                       (lease_id,))]
+            return Lease(lease_id, song_ids, expires_at) if song_ids else None
+        return self._transaction(claim_batch)
+
+    def renew(self, lease):
+        """Extend a lease. Returns the number of songs still held under it."""
+        def extend(conn):
+            expires_at = time.time() + self.lease_seconds
+            held = conn.execute('UPDATE tasks SET lease_expires = ? WHERE lease_id = ? AND status = ?',
+                                (expires_at, lease.lease_id, TASK_LEASED)).rowcount
+            lease.expires_at = expires_at
+            return held
+        return self._transaction(extend)
+
+    def complete(self, lease, results):
+        """Record outcomes ({song_id: result text}) for songs of a lease.
+
+        Songs no longer held under this lease are ignored. Returns the set
+        of song IDs recorded."""
+        def record(conn):
+            now = time.time()
+            recorded = set()
+            for song_id, result in results.items():
+                if conn.execute('UPDATE tasks SET status = ?, result = ?, lease_expires = NULL, updated_at = ? '
+                                'WHERE song_id = ? AND lease_id = ? AND status = ?',
+                                (TASK_DONE, result, now, song_id, lease.lease_id, TASK_LEASED)).rowcount:
+                    recorded.add(song_id)
+            return recorded
+        return self._transaction(record)
+
+    def release(self, lease, song_ids):
+        """Hand songs of a lease back to the pending pool.
+
+        Songs that have already been leased max_leases times are marked failed instead."""
+        def give_back(conn):
+            now = time.time()
+            conn.executemany('UPDATE tasks SET status = CASE WHEN leases >= ? THEN ? ELSE ? END, '
+                             'lease_id = NULL, node = NULL, updated_at = ? '
+                             'WHERE song_id = ? AND lease_id = ? AND status = ?',
+                             [(self.max_leases, TASK_FAILED, TASK_PENDING, now, song_id, lease.lease_id,
+                               TASK_LEASED) for song_id in song_ids])
+        self._transaction(give_back)
+
+    def counts(self):
+        """Songs per task status."""
+        with self.lock:
+            counts = dict(self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in (TASK_PENDING, TASK_LEASED, TASK_DONE, TASK_FAILED)}
+
+    def node_counts(self):
+        """Finished songs per node."""
+        with self.lock:
+            return dict(self.conn.execute('SELECT node, COUNT(*) FROM tasks WHERE status = ? GROUP BY node',
+                                          (TASK_DONE,)).fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class LeaseKeeper:
+    """Renew a lease in the background until stopped."""
+
+    def __init__(self, coordinator, lease):
+        self.coordinator = coordinator
+        self.lease = lease
+        self.stopped = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self._run, name=f"lease-{lease.lease_id}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        interval = self.coordinator.lease_seconds / 3
+        while not self.stopped.wait(interval):
+            try:
+                if not self.coordinator.renew(self.lease):
+                    self.lost = True
+                    print(f"Lease {self.lease.lease_id} was taken over by another node")
+                    return
+            except sqlite3.Error as e:
+                # Keep trying; the lease only lapses if renewals fail for lease_seconds
+                print(f"Error renewing lease {self.lease.lease_id}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+def run_node(ctx, coordinator, batch_size=CLAIM_BATCH, max_workers=PIPELINE_WORKERS):
+    """Claim batches from the coordinator and run the combined pipeline on them until no work is left."""
+    from tqdm import tqdm
+    from .pipeline import process_song
+    from .retry import DelayedRetryQueue, run_with_retries
+
+    ctx.ensure_dirs()
+    bad_lyrics_ids = ctx.id_set('bad_lyrics')
+    no_url_ids = ctx.id_set('no_url')
+    processed = 0
+    good = 0
+
+    print(f"Node {coordinator.node_id} working from {coordinator.path}")
+    try:
+        while True:
+            lease = coordinator.claim(batch_size)
+            if lease is None:
+                counts = coordinator.counts()
+                if not counts[TASK_LEASED]:
+                    break
+                # Other nodes still hold leases; wait for them to finish or expire
+                print(f"No pending songs; {counts[TASK_LEASED]} leased by other nodes, waiting...")
+                time.sleep(IDLE_WAIT)
+                continue
+
+            keeper = LeaseKeeper(coordinator, lease)
+            results = {}
+            retry_queue = DelayedRetryQueue()
+
+            def process(song_id):
+                # The lease went to another node: leave the rest of the batch to it
+                if keeper.lost:
+                    return None
+                return process_song(song_id, ctx, bad_lyrics_ids, no_url_ids)
+
+            try:
+                with tqdm(total=len(lease.song_ids), desc=f"Lease {lease.lease_id}") as pbar:
+                    def on_result(song_id, result):
+                        pbar.update(1)
+                        pbar.set_postfix(**retry_queue.postfix())
+                        # None means the song failed, ran out of retries or could not be
+                        # decided (e.g. the lyric API had no answer): hand it back
+                        if result is not None:
+                            results[song_id] = 'good' if result else 'bad'
+
+                    run_with_retries((song_id for song_id in lease.song_ids if not keeper.lost), process,
+                                     max_workers, on_result, retry_queue,
+                                     on_error=lambda song_id, e: print(f"Error processing song {song_id}: {e}"))
+            finally:
+                keeper.stop()
+                # Results are written locally before the coordinator hears about them
+                ctx.save_id_set('bad_lyrics')
+                ctx.save_id_set('no_url')
+                ctx.writer.flush()
+                recorded = coordinator.complete(lease, results)
+                coordinator.release(lease, [song_id for song_id in lease.song_ids if song_id not in results])
+
+            if len(recorded) < len(results):
+                print(f"Lease {lease.lease_id}: {len(results) - len(recorded)} results were not recorded "
+                      f"because the lease expired")
+            processed += len(recorded)
+            good += sum(1 for song_id in recorded if results[song_id] == 'good')
+    except KeyboardInterrupt:
+        print("\nInterrupted. Unfinished songs were handed back to the coordinator.")
+
+    counts = coordinator.counts()
+    print(f"\nNode Results:")
+    print(f"- Processed {processed} songs on this node ({good} with good lyrics)")
+    print(f"- Coordinator: {counts[TASK_DONE]} done, {counts[TASK_PENDING]} pending, "
+          f"{counts[TASK_LEASED]} leased, {counts[TASK_FAILED]} failed")
+    for line in ctx.api.summary():
+        print(f"- API {line}")
+    return processed
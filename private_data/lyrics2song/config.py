@@ -0,0 +1,53 @@
+"""Shared settings for every pipeline phase."""
+import os
+
+# Locations
+OUTPUT_DIR = '/data/shared_hdd/netease'
+METADATA_PATH = '/renhangx/lyrics2song/data/metadata_package'
+ID_LIST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'english_song_ids_list')
+
+# File names inside the output directory
+EXTRACTED_IDS_FILE = 'english_song_ids.txt'  # written by the extract phase
+ENGLISH_IDS_FILE = 'english_song_ids_800k.txt'  # read by the lyric phases when there is no merged list
+CANONICAL_IDS_FILE = 'english_song_ids_merged.bin'  # written by the ids command, read by every stage
+GOOD_LYRICS_IDS_FILE = 'good_lyrics_ids.txt'
+BAD_LYRICS_IDS_FILE = 'bad_lyrics_ids.txt'
+NO_URL_IDS_FILE = 'no_url_ids.txt'
+DUPLICATE_LYRICS_IDS_FILE = 'duplicate_lyrics_ids.txt'  # near-duplicates skipped by the copy cap
+URLS_FILE = 'download_urls.json'
+URLS_CHECKPOINT_FILE = 'download_urls_checkpoint.json'
+STATE_FILE = 'pipeline_state.db'
+LYRIC_INDEX_FILE = 'lyric_index.db'
+METADATA_INDEX_FILE = 'metadata_index.bin'
+COORDINATOR_FILE = 'coordinator.db'  # put it on storage every node can reach
+PROFILE_FILE = 'profile.folded'  # folded stacks written by --profile
+TRACE_FILE = 'song_traces.jsonl'  # per-song lifecycle traces written by run --trace
+LYRICS_DIR = 'lyrics'
+SONGS_DIR = 'songs'
+
+# API settings
+API_BASE_URLS = ['http://localhost:3000']  # requests are balanced across all instances
+API_TIMEOUT = 10  # seconds
+DOWNLOAD_TIMEOUT = 30  # seconds
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # seconds
+URL_TTL = 1200  # seconds a resolved song URL stays valid when /song/url gives no expi
+URL_REFRESH_MARGIN = 120  # seconds; URLs closer than this to expiry are re-resolved
+EXPIRED_URL_STATUSES = (403, 404, 410)  # CDN answers for expired or revoked URLs
+
+# Worker counts per phase
+PIPELINE_WORKERS = 12
+LYRIC_WORKERS = 8
+URL_WORKERS = 20
+DOWNLOAD_WORKERS = 10
+
+# Lyric filter settings
+MIN_LYRIC_LENGTH = 100  # Minimum characters for a "good" lyric
+MIN_ENGLISH_SEGMENTS = 6  # Minimum number of English segments required
+
+# Song download settings
+CHUNK_SIZE = 8192  # bytes for streaming download
+SONG_EXTENSIONS = ('mp3', 'm4a', 'flac')
+
+# Checkpoint interval for ID sets, in processed songs
+SAVE_INTERVAL = 100
@@ -0,0 +1,157 @@
+"""State shared by the phases of one CLI invocation."""
+import os
+import threading
+
+from . import config
+from .quality import QualityPolicy
+from .profiling import timed
+
+# ID sets persisted as one ID per line in the output directory
+ID_SET_FILES = {
+    'bad_lyrics': config.BAD_LYRICS_IDS_FILE,
+    'no_url': config.NO_URL_IDS_FILE,
+    'duplicate_lyrics': config.DUPLICATE_LYRICS_IDS_FILE,
+}
+
+class PipelineContext:
+    """Output locations plus the resources phases share when run in-process.
+
+    The API pool, state store, ID lists and ID sets are created on first use
+    and reused by every later phase, so running several phases in one
+    process loads each of them once."""
+
+    def __init__(self, output_dir=config.OUTPUT_DIR, api_base_urls=None, quality=None,
+                 staging_dir=None, staging_high_watermark=None, min_free_bytes=None, fsync='none'):
+        self.output_dir = output_dir
+        self.lyrics_dir = os.path.join(output_dir, config.LYRICS_DIR)
+        self.songs_dir = os.path.join(output_dir, config.SONGS_DIR)
+        self.api_base_urls = api_base_urls or config.API_BASE_URLS
+        self.quality = quality or QualityPolicy()
+        self.staging_dir = staging_dir
+        self.staging_high_watermark = staging_high_watermark
+        self.min_free_bytes = min_free_bytes
+        self.fsync = fsync
+        self._lock = threading.RLock()  # worker threads may touch a resource first
+        self._api = None
+        self._state = None
+        self._staging = None
+        self._admission = None
+        self._writer = None
+        self._id_lists = {}
+        self._id_sets = {}
+
+    def path(self, name):
+        """Path of a file in the output directory."""
+        return os.path.join(self.output_dir, name)
+
+    def ensure_dirs(self):
+        os.makedirs(self.lyrics_dir, exist_ok=True)
+        os.makedirs(self.songs_dir, exist_ok=True)
+        if self.staging_dir:
+            os.makedirs(self.staging_dir, exist_ok=True)
+
+    @property
+    def api(self):
+        with self._lock:
+            if self._api is None:
+                from .api_pool import ApiPool
+                self._api = ApiPool(self.api_base_urls)
+            return self._api
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state is None:
+                from .state import StateStore
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._state = StateStore(self.path(config.STATE_FILE))
+            return self._state
+
+    @property
+    def staging(self):
+        """StagingArea for downloads, or None when no staging directory is configured."""
+        with self._lock:
+            if self._staging is None and self.staging_dir:
+                from .staging import StagingArea, STAGING_HIGH_WATERMARK
+                os.makedirs(self.songs_dir, exist_ok=True)
+                self._staging = StagingArea(self.staging_dir, self.songs_dir, self.state,
+                                            self.staging_high_watermark or STAGING_HIGH_WATERMARK)
+            return self._staging
+
+    @property
+    def admission(self):
+        """DownloadAdmission watching the volumes downloads are written to."""
+        with self._lock:
+            if self._admission is None:
+                from .admission import DownloadAdmission, MIN_FREE_BYTES
+                self.ensure_dirs()
+                paths = [self.songs_dir] + ([self.staging_dir] if self.staging_dir else [])
+                min_free = MIN_FREE_BYTES if self.min_free_bytes is None else self.min_free_bytes
+                self._admission = DownloadAdmission(paths, min_free)
+            return self._admission
+
+    @property
+    def writer(self):
+        """BackgroundWriter for lyric files and ID-set checkpoints."""
+        with self._lock:
+            if self._writer is None:
+                from .writer import BackgroundWriter
+                self._writer = BackgroundWriter(self.fsync)
+            return self._writer
+
+    def song_ids(self, path):
+        """Deduplicated, sorted IDs from a list file, loaded once per process."""
+        if path not in self._id_lists:
+            from .ids import load_song_ids
+            self._id_lists[path] = load_song_ids(path)
+        return self._id_lists[path]
+
+    def id_set(self, name):
+        """A persisted ID set (a key of ID_SET_FILES), loaded once per process."""
+        if name not in self._id_sets:
+            ids = set()
+            path = self.path(ID_SET_FILES[name])
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    ids = {line.strip() for line in f if line.strip()}
+            self._id_sets[name] = ids
+        return self._id_sets[name]
+
+    @timed('ID checkpoint')
+    def save_id_set(self, name):
+        """Queue a snapshot of a loaded ID set to be written back to its file."""
+        if name not in self._id_sets:
+            return
+        self.writer.write_lines(self.path(ID_SET_FILES[name]), list(self._id_sets[name]))
+
+    def summary(self):
+        """Report lines for the download quality and for the shared resources this run created.
+
+        Waits for the staging mover first, so its numbers cover every file."""
+        lines = [f"Downloaded {line}" for line in self.quality.summary()]
+        if self._staging is not None:
+            self._staging.flush()
+            lines.extend(self._staging.summary())
+        for resource in (self._admission, self._writer):
+            if resource is not None:
+                lines.extend(resource.summary())
+        if self._api is not None:
+            lines.extend(f"API {line}" for line in self._api.summary())
+        return lines
+
+    def close(self):
+        for name in list(self._id_sets):
+            self.save_id_set(name)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._api is not None:
+            self._api.close()
+            self._api = None
+        if self._staging is not None:
+            # Finish migrating before the state store closes
+            self._staging.close()
+            self._staging = None
+        if self._state is not None:
+            self._state.close()
+            self._state = None
@@ -0,0 +1,194 @@
+"""Near-duplicate lyric detection with MinHash and LSH.
+
+Covers, live versions and re-uploads share (nearly) the same lyrics. Each
+good lyric is reduced to a hash of its normalized text plus a MinHash
+signature over word shingles; LSH bands over the signature find candidate
+matches with a few indexed lookups, so the persisted index stays fast at
+millions of entries."""
+import re
+import sqlite3
+import random
+import hashlib
+import threading
+from array import array
+
+from .lyrics import TIMESTAMP_PATTERN
+
+NUM_PERM = 32  # MinHash permutations; the signature is stored as 32-bit values
+LSH_BANDS = 8  # NUM_PERM must be LSH_BANDS * rows; 8x4 finds pairs above ~0.6 similarity
+SHINGLE_SIZE = 3  # words per shingle
+SIMILARITY_THRESHOLD = 0.8  # estimated Jaccard similarity that counts as a copy
+MAX_CANDIDATES = 32  # LSH candidates compared per lyric
+DEFAULT_MAX_COPIES = 1  # songs per distinct lyric that are downloaded
+DEDUP_MODES = ('flag', 'skip', 'defer')
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # fixed seed: signatures must match across runs
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_NON_WORD = re.compile(r"[^a-z0-9']+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lyrics (
+    song_id TEXT PRIMARY KEY,
+    text_hash INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    cluster_id TEXT NOT NULL,
+    copy INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lyrics_text_hash ON lyrics (text_hash);
+CREATE TABLE IF NOT EXISTS lsh_bands (
+    band_key INTEGER NOT NULL,
+    song_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lsh_bands_key ON lsh_bands (band_key);
+CREATE TABLE IF NOT EXISTS clusters (
+    cluster_id TEXT PRIMARY KEY,
+    copies INTEGER NOT NULL
+);
+"""
+
+def _hash64(data):
+    """Signed 64-bit hash, so it fits an SQLite INTEGER."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True)
+
+def normalize_lines(processed_lyrics):
+    """Lyric lines without timestamps, case or punctuation; empty lines dropped."""
+    lines = []
+    for line in processed_lyrics.splitlines():
+        words = _NON_WORD.sub(' ', TIMESTAMP_PATTERN.sub('', line).lower()).split()
+        if words:
+            lines.append(' '.join(words))
+    return lines
+
+def minhash(lines):
+    """MinHash signature over the word shingles of the normalized lines."""
+    words = ' '.join(lines).split()
+    if len(words) >= SHINGLE_SIZE:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    else:
+        shingles = set(lines)
+    hashes = [_hash64(shingle.encode()) & 0xFFFFFFFFFFFFFFFF for shingle in shingles] or [0]
+    return array('I', (min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF
+                       for a, b in _PERMUTATIONS))
+
+def band_keys(signature):
+    """One LSH key per band of the signature."""
+    rows = NUM_PERM // LSH_BANDS
+    return [_hash64(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(LSH_BANDS)]
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+class LyricIndex:
+    """Persisted index that groups near-identical lyrics into clusters.
+
+    Every added song joins the cluster of the first indexed lyric it matches
+    (or starts its own) and gets a copy number within that cluster."""
+
+    def __init__(self, path, threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def _find_cluster(self, text_hash, signature, keys):
+        row = self.conn.execute('SELECT cluster_id FROM lyrics WHERE text_hash = ? LIMIT 1',
+                                (text_hash,)).fetchone()
+        if row:
+            return row[0]
+        placeholders = ','.join('?' * len(keys))
+        candidates = self.conn.execute(
+            f'SELECT l.cluster_id, l.signature FROM lyrics l WHERE l.song_id IN '
+            f'(SELECT DISTINCT song_id FROM lsh_bands WHERE band_key IN ({placeholders}) LIMIT ?)',
+            (*keys, MAX_CANDIDATES)).fetchall()
+        best_cluster, best_similarity = None, self.threshold
+        for cluster_id, blob in candidates:
+            score = similarity(signature, array('I', blob))
+            if score >= best_similarity:
+                best_cluster, best_similarity = cluster_id, score
+        return best_cluster
+
+    def add(self, song_id, processed_lyrics):
+        """Index a song's lyrics. Returns (cluster_id, copy number starting at 1).
+
+        Adding a song again returns its original result."""
+        lines = normalize_lines(processed_lyrics)
+        text_hash = _hash64('\n'.join(lines).encode())
+        signature = minhash(lines)
+        keys = band_keys(signature)
+        with self.lock:
+            row = self.conn.execute('SELECT cluster_id, copy FROM lyrics WHERE song_id = ?',
+                                    (song_id,)).fetchone()
+            if row:
+                return row[0], row[1]
+            cluster_id = self._find_cluster(text_hash, signature, keys) or song_id
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.execute('INSERT INTO clusters (cluster_id, copies) VALUES (?, 1) '
+                                  'ON CONFLICT(cluster_id) DO UPDATE SET copies = copies + 1',
+                                  (cluster_id,))
+                copy = self.conn.execute('SELECT copies FROM clusters WHERE cluster_id = ?',
+                                         (cluster_id,)).fetchone()[0]
+                self.conn.execute('INSERT INTO lyrics (song_id, text_hash, signature, cluster_id, copy) '
+                                  'VALUES (?, ?, ?, ?, ?)',
+                                  (song_id, text_hash, signature.tobytes(), cluster_id, copy))
+                self.conn.executemany('INSERT INTO lsh_bands (band_key, song_id) VALUES (?, ?)',
+                                      [(key, song_id) for key in keys])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return cluster_id, copy
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class DuplicateFilter:
+    """Apply a per-lyric copy cap before a song's URL is resolved.
+
+    Songs past the cap are counted and then, depending on mode:
+    - flag: downloaded anyway
+    - skip: added to duplicate_ids and never downloaded
+    - defer: kept in self.deferred to be downloaded after everything else"""
+
+    def __init__(self, index, mode, max_copies=DEFAULT_MAX_COPIES, duplicate_ids=None):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"unknown dedup mode {mode!r}, expected one of {DEDUP_MODES}")
+        self.index = index
+        self.mode = mode
+        self.max_copies = max_copies
+        self.duplicate_ids = duplicate_ids if duplicate_ids is not None else set()
+        self.lock = threading.Lock()
+        self.deferred = []
+        self.unique = 0
+        self.duplicates = 0
+
+    def skipped(self, song_id):
+        return song_id in self.duplicate_ids
+
+    def admit(self, song_id, processed_lyrics):
+        """Whether the song should be downloaded now."""
+        _, copy = self.index.add(song_id, processed_lyrics)
+        with self.lock:
+            if copy <= self.max_copies:
+                self.unique += 1
+                return True
+            self.duplicates += 1
+            if self.mode == 'flag':
+                return True
+            if self.mode == 'skip':
+                self.duplicate_ids.add(song_id)
+            else:
+                self.deferred.append(song_id)
+            return False
+
+    def summary(self):
+        with self.lock:
+            return [f"Lyric dedup ({self.mode}, max {self.max_copies} per lyric): "
+                    f"{self.unique} within the cap, {self.duplicates} near-duplicates"]
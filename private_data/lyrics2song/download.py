@@ -0,0 +1,176 @@
+"""Streaming song downloads with inline integrity checks."""
+import os
+import time
+import errno
+import shutil
+import requests
+
+from .api import get_song_url, url_is_stale
+from .config import CHUNK_SIZE, DOWNLOAD_TIMEOUT, EXPIRED_URL_STATUSES, SONG_EXTENSIONS
+from .integrity import new_hasher, download_status, existing_download_ok, expected_md5, STATUS_MISMATCH
+from .admission import DISK_POLL_INTERVAL
+from .profiling import timed
+from . import profiling, tracing
+from .retry import Deferred, RetryLater
+
+DOWNLOAD_STAGE = 'download'  # retry stage of CDN downloads
+
+class UrlExpired(RetryLater):
+    """The CDN rejected a song URL because it expired; resolve a new one."""
+
+def song_exists(songs_dir, song_id, staging_dir=None):
+    """Check whether audio for a song has already been downloaded.
+
+    Files still waiting in staging_dir count as downloaded."""
+    song_dirs = (songs_dir, staging_dir) if staging_dir else (songs_dir,)
+    return any(os.path.exists(os.path.join(song_dir, f"{song_id}.{extension}"))
+               for song_dir in song_dirs for extension in SONG_EXTENSIONS)
+
+def downloaded_song_ids(songs_dir, staging_dir=None):
+    """IDs of all songs with audio in songs_dir or waiting in staging_dir."""
+    suffixes = tuple(f".{extension}" for extension in SONG_EXTENSIONS)
+    song_dirs = (songs_dir, staging_dir) if staging_dir else (songs_dir,)
+    return {os.path.splitext(name)[0] for song_dir in song_dirs
+            for name in os.listdir(song_dir) if name.endswith(suffixes)}
+
+@timed('download')
+def _stream_to_file(song_id, url, temp_path, show_progress=False):
+    """Stream a URL into temp_path. Returns (size, md5 hex digest)."""
+    try:
+        response = requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        if response.status_code in EXPIRED_URL_STATUSES:
+            raise UrlExpired(f"URL for song {song_id} expired, status: {response.status_code}", DOWNLOAD_STAGE)
+        if response.status_code != 200:
+            raise RetryLater(f"failed to download song {song_id}, status: {response.status_code}", DOWNLOAD_STAGE)
+        
+        bar = None
+        if show_progress:
+            from tqdm import tqdm
+            bar = tqdm(desc=f"Downloading {song_id}",
+                       total=int(response.headers.get('content-length', 0)),
+                       unit='B', unit_scale=True, unit_divisor=1024,
+                       leave=False)  # Don't leave the progress bar after completion
+        
+        hasher = new_hasher()
+        size = 0
+        # Chunk writes are only timed for a profile or a traced song, and
+        # reported once per download rather than per chunk
+        time_writes = profiling.enabled() or tracing.traced(song_id)
+        write_time = 0.0
+        write_cpu = 0.0
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        if time_writes:
+                            started, started_cpu = time.perf_counter(), time.thread_time()
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            write_time += time.perf_counter() - started
+                            write_cpu += time.thread_time() - started_cpu
+                        else:
+                            f.write(chunk)
+                            hasher.update(chunk)
+                        size += len(chunk)
+                        if bar is not None:
+                            bar.update(len(chunk))
+        finally:
+            if bar is not None:
+                bar.close()
+            if time_writes:
+                profiling.add_stage('download write', write_time, write_cpu)
+                # Split the download span into CDN and disk time
+                tracing.event(song_id, 'disk write', write_time)
+    except RetryLater:
+        raise
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+            # Retrying right away would only fail again; wait for space instead
+            raise Deferred(f"no space left for song {song_id}", DISK_POLL_INTERVAL, DOWNLOAD_STAGE) from e
+        raise RetryLater(f"error downloading song {song_id}: {e}", DOWNLOAD_STAGE) from e
+    return size, hasher.hexdigest()
+
+def download_song(song_data, songs_dir, state, quality, show_progress=False, staging=None,
+                  admission=None):
+    """Download a song using its URL, hashing it as it is written.
+
+    With a StagingArea the file is written to the staging directory and
+    handed to its mover instead of going straight to songs_dir; Deferred is
+    raised while the staging directory is above its high watermark. With a
+    DownloadAdmission the song's size is reserved first, and Deferred is
+    raised if the disks cannot take it now.
+    Makes one attempt and raises RetryLater if it fails."""
+    song_id = song_data['id']
+    url = song_data['url']
+    file_type = song_data.get('type') or 'mp3'
+    song_path = os.path.join(songs_dir, f"{song_id}.{file_type}")
+    
+    # Skip if already downloaded
+    if os.path.exists(song_path):
+        # If file exists and matches the expected size and checksum, skip download
+        if existing_download_ok(song_data, song_path, state):
+            return song_path
+        else:
+            # Remove the file if it is incomplete or corrupt
+            os.remove(song_path)
+
+    if staging is not None:
+        # Staged files were verified before they were queued for migration
+        song_path = staging.staged_path(song_id, file_type)
+        if os.path.exists(song_path):
+            return song_path
+        staging.check_space(song_id)
+    
+    # Download the file in a single attempt; failures are retried by the caller
+    temp_path = f"{song_path}.tmp"
+    reserved = admission.reserve(song_id, song_data.get('size')) if admission is not None else None
+    size = 0
+    try:
+        size, md5 = _stream_to_file(song_id, url, temp_path, show_progress)
+    finally:
+        if reserved is not None:
+            admission.release(reserved, size)
+    
+    status = download_status(size, md5, song_data)
+    state.record_download(song_id, song_path, size, md5, expected_md5(song_data), status, song_data.get('br'))
+    if status == STATUS_MISMATCH:
+        os.remove(temp_path)
+        raise RetryLater(f"checksum mismatch for song {song_id}", DOWNLOAD_STAGE)
+    
+    # Move the temporary file to the final destination
+    shutil.move(temp_path, song_path)
+    if staging is not None:
+        staging.add(song_id, song_path, size)
+    quality.record_download(song_data, size)
+    return song_path
+
+def resolve_and_download(song_id, ctx, song_data=None, no_url_ids=None, show_progress=False):
+    """Download a song, resolving its URL just before the download starts.
+
+    A cached URL record is only used while it is fresh. If the CDN still
+    rejects the URL as expired, a new one is resolved and the download is
+    retried once inline. Returns the URL record used, or None if the song
+    has no URL."""
+    ctx.admission.check(song_id)
+    if song_data is None or url_is_stale(song_data):
+        with tracing.span(song_id, 'url'):
+            song_data = get_song_url(song_id, ctx.api, ctx.quality, no_url_ids)
+        if not song_data:
+            return None
+
+    try:
+        with tracing.span(song_id, 'download'):
+            download_song(song_data, ctx.songs_dir, ctx.state, ctx.quality, show_progress, ctx.staging,
+                          ctx.admission)
+    except UrlExpired as e:
+        print(f"{e}; re-resolving")
+        with tracing.span(song_id, 'url'):
+            song_data = get_song_url(song_id, ctx.api, ctx.quality, no_url_ids)
+        if not song_data:
+            return None
+        with tracing.span(song_id, 'download'):
+            download_song(song_data, ctx.songs_dir, ctx.state, ctx.quality, show_progress, ctx.staging,
+                          ctx.admission)
+    return song_data
@@ -0,0 +1,84 @@
+"""Download phase: download songs from the URL checkpoint that are not on disk yet."""
+import os
+import json
+from tqdm import tqdm
+
+from .api import url_is_stale
+from .config import DOWNLOAD_WORKERS, URLS_CHECKPOINT_FILE
+from .download import resolve_and_download, song_exists
+from .retry import DelayedRetryQueue, run_with_retries
+
+def save_url_records(urls_file, songs_data):
+    """Rewrite the URL checkpoint atomically."""
+    temp_path = f"{urls_file}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(songs_data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, urls_file)
+
+def download_missing_songs(ctx, urls_file=None, max_workers=DOWNLOAD_WORKERS):
+    """Check for songs in the URLs file that haven't been downloaded yet and try to download them.
+
+    Cached URLs are only used while fresh: stale ones are re-resolved when
+    their download slot opens, and URLs the CDN rejects as expired are
+    re-resolved inline, so everything is done in a single pass."""
+    urls_file = urls_file or ctx.path(URLS_CHECKPOINT_FILE)
+    if not os.path.exists(urls_file):
+        print(f"Error: URLs file {urls_file} not found. Run the urls command first.")
+        return
+
+    with open(urls_file, 'r') as f:
+        # Keep one record per song so the same file is never downloaded twice at once
+        records = {str(song_data['id']): song_data for song_data in json.load(f)}
+
+    ctx.ensure_dirs()
+
+    # Check which songs need to be downloaded
+    missing_songs = []
+
+    for song_id in records:
+        if not song_exists(ctx.songs_dir, song_id, ctx.staging_dir):
+            missing_songs.append(song_id)
+
+    stale_count = sum(1 for song_id in missing_songs if url_is_stale(records[song_id]))
+
+    print(f"Checking {len(records)} songs:")
+    print(f"- Missing songs to download: {len(missing_songs)}")
+    print(f"- Cached URLs that are stale and will be re-resolved: {stale_count}")
+
+    if not missing_songs:
+        print("No missing songs to download.")
+        return
+
+    successful_downloads = 0
+    failed_downloads = 0
+
+    print("\nDownloading missing songs...")
+    retry_queue = DelayedRetryQueue()
+    with tqdm(total=len(missing_songs), desc="Downloading songs") as pbar:
+        def on_result(song_id, song_data):
+            nonlocal successful_downloads, failed_downloads
+            pbar.update(1)
+            pbar.set_postfix(**retry_queue.postfix())
+            if song_data:
+                records[song_id] = song_data
+                successful_downloads += 1
+            else:
+                failed_downloads += 1
+
+        run_with_retries(missing_songs,
+                         lambda song_id: resolve_and_download(song_id, ctx, records[song_id],
+                                                              show_progress=True),
+                         max_workers, on_result, retry_queue)
+
+    # Keep the refreshed URLs and their expiry for the next run
+    try:
+        save_url_records(urls_file, list(records.values()))
+    except Exception as e:
+        print(f"Error saving URLs data: {e}")
+
+    print(f"\nDownload completed:")
+    print(f"- Successfully downloaded: {successful_downloads} out of {len(missing_songs)}")
+    print(f"- Failed to download: {failed_downloads}")
+    print(f"- Songs saved to {ctx.songs_dir}")
+    for line in ctx.summary():
+        print(f"- {line}")
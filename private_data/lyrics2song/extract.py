@@ -1,36 +1,32 @@
-#!/usr/bin/env python3
+"""Extract phase: find English songs in the metadata package."""
 import os
 import json
-import glob
 from tqdm import tqdm
 
-# Define the paths
-METADATA_PATH = '/renhangx/lyrics2song/data/metadata_package'
-OUTPUT_DIR = '/data/shared_hdd/netease'
-ENGLISH_IDS_FILE = os.path.join(OUTPUT_DIR, 'english_song_ids.txt')
+from .config import EXTRACTED_IDS_FILE, METADATA_PATH
+from .ids import canonical_path, sorted_unique_ids, write_id_list
+from .metadata import metadata_files
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-def process_metadata_files():
+def process_metadata_files(ctx, metadata_path=METADATA_PATH):
     """Extract song IDs that have English as their language."""
     english_ids = []
-    
+    english_ids_file = ctx.path(EXTRACTED_IDS_FILE)
+
+    # Create output directory if it doesn't exist
+    os.makedirs(ctx.output_dir, exist_ok=True)
+
     # Get all metadata files
-    metadata_files = []
-    for batch_dir in glob.glob(os.path.join(METADATA_PATH, 'batch*')):
-        metadata_dir = os.path.join(batch_dir, 'metadata')
-        metadata_files.extend(glob.glob(os.path.join(metadata_dir, '*.json')))
-    
+    json_files = metadata_files(metadata_path)
+
     print("Processing metadata files to find English songs...")
-    
+
     # Process each metadata JSON file
-    for json_file in tqdm(metadata_files, desc="Processing metadata files"):
+    for json_file in tqdm(json_files, desc="Processing metadata files"):
         try:
             with open(json_file, 'r', encoding='utf-8') as f:
                 # Load the entire JSON file
                 data = json.load(f)
-                
+
                 # Iterate through all songs in the data
                 for song_id, song_info in data.items():
                     # Check if the language is English
@@ -41,16 +37,14 @@ def process_metadata_files():
             # Print error but continue with other files
             print(f"Error processing {json_file}: {str(e)}")
             continue
-    
+
     # Save the English song IDs to a file
-    with open(ENGLISH_IDS_FILE, 'w') as f:
+    with open(english_ids_file, 'w') as f:
         for song_id in english_ids:
             f.write(f"{song_id}\n")
-    
-    print(f"\nFound {len(english_ids)} English songs. IDs saved to {ENGLISH_IDS_FILE}")
-    return english_ids
 
-if __name__ == "__main__":
-    print("Starting to extract English song IDs...")
-    process_metadata_files()
-    print("Extraction completed.") 
\ No newline at end of file
+    # Write the deduplicated canonical list read by the later stages
+    unique_count = write_id_list(canonical_path(english_ids_file), sorted_unique_ids([english_ids_file]))
+
+    print(f"\nFound {len(english_ids)} English songs ({unique_count} unique). IDs saved to {english_ids_file}")
+    return english_ids
@@ -0,0 +1,93 @@
+"""Lyric phase: fetch lyrics for all English songs and keep the good ones."""
+import os
+from tqdm import tqdm
+
+from .api import get_song_lyric
+from .config import GOOD_LYRICS_IDS_FILE, LYRIC_WORKERS
+from .lyrics import is_good_lyric
+from .retry import DelayedRetryQueue, run_with_retries
+
+def save_good_lyrics_ids(path, good_lyrics_ids):
+    with open(path, 'w', encoding='utf-8') as f:
+        for song_id in good_lyrics_ids:
+            f.write(f"{song_id}\n")
+
+def fetch_and_filter_lyrics(ctx, english_ids_file, max_workers=LYRIC_WORKERS, skip_new=False):
+    """Fetch lyrics for all English songs and filter out songs with short lyrics."""
+    good_lyrics_ids_file = ctx.path(GOOD_LYRICS_IDS_FILE)
+
+    # Load the English song IDs
+    if not os.path.exists(english_ids_file):
+        print(f"Error: English song IDs file {english_ids_file} not found.")
+        return None
+
+    song_ids = ctx.song_ids(english_ids_file)
+
+    print(f"Found {len(song_ids)} songs to process for lyrics")
+
+    # Create directory for lyrics
+    ctx.ensure_dirs()
+
+    # Check which lyrics we already have
+    existing_lyrics = set()
+    for lyric_file in os.listdir(ctx.lyrics_dir):
+        if lyric_file.endswith('.json') or lyric_file.endswith('.txt'):
+            existing_lyrics.add(lyric_file.split('.')[0])
+
+    # Filter out song IDs that we've already processed
+    song_ids = [id for id in song_ids if id not in existing_lyrics]
+    print(f"Remaining songs to fetch lyrics for: {len(song_ids)}")
+
+    # Fetch lyrics using thread pool
+    successful_lyrics = len(existing_lyrics)
+
+    # Existing lyric files only exist for good lyrics
+    good_lyrics_ids = list(existing_lyrics)
+    print(f"Found {len(good_lyrics_ids)} songs with good lyrics from existing files")
+
+    if skip_new:
+        print("Skipping new lyrics...")
+        save_good_lyrics_ids(good_lyrics_ids_file, good_lyrics_ids)
+        return good_lyrics_ids
+
+    # Fetch new lyrics and filter
+    print("\nFetching new lyrics...")
+    retry_queue = DelayedRetryQueue()
+    try:
+        with tqdm(total=len(song_ids), desc="Fetching lyrics") as pbar:
+            def on_result(song_id, lyric_data):
+                nonlocal successful_lyrics
+                pbar.update(1)
+                pbar.set_postfix(**retry_queue.postfix())
+                if not lyric_data:
+                    return
+                # Check if lyrics meet our criteria
+                is_good, processed_lyrics = is_good_lyric(lyric_data)
+                if is_good:
+                    # Save just the processed lyric text, in the background
+                    txt_file = os.path.join(ctx.lyrics_dir, f"{song_id}.txt")
+                    ctx.writer.write_text(txt_file, processed_lyrics)
+                    good_lyrics_ids.append(song_id)
+
+                successful_lyrics += 1
+
+            run_with_retries(song_ids, lambda song_id: get_song_lyric(song_id, ctx.api),
+                             max_workers, on_result, retry_queue,
+                             on_error=lambda song_id, e: print(f"Error processing lyrics result for song {song_id}: {e}"))
+    finally:
+        # Lyric files must be on disk before the good IDs list refers to them
+        ctx.writer.flush()
+
+    # Save the list of song IDs with good lyrics
+    print(f"\nSaving {len(good_lyrics_ids)} songs with good lyrics...")
+    save_good_lyrics_ids(good_lyrics_ids_file, good_lyrics_ids)
+
+    print(f"\nLyrics Results:")
+    print(f"- Successfully fetched {successful_lyrics} lyrics")
+    print(f"- Found {len(good_lyrics_ids)} songs with good lyrics")
+    print(f"- Good lyrics IDs saved to {good_lyrics_ids_file}")
+    print(f"- All lyrics saved to {ctx.lyrics_dir}")
+    for line in ctx.api.summary():
+        print(f"- API {line}")
+
+    return good_lyrics_ids
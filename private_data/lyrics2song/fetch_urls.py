@@ -0,0 +1,86 @@
+"""URL phase: resolve download URLs for songs with good lyrics and download them."""
+import os
+import json
+from tqdm import tqdm
+
+from .config import GOOD_LYRICS_IDS_FILE, URLS_FILE, URL_WORKERS
+from .download import downloaded_song_ids, resolve_and_download
+from .retry import DelayedRetryQueue, run_with_retries
+
+def process_song(song_id, ctx):
+    """Process a single song: fetch URL, download song, and return metadata."""
+    # The URL is resolved right before the download so it cannot expire in
+    # between; an expired URL is re-resolved inline.
+    return resolve_and_download(song_id, ctx)
+
+def fetch_and_download_songs(ctx, song_ids=None, max_workers=URL_WORKERS):
+    """Fetch URLs and immediately download songs for all songs with good lyrics.
+
+    song_ids defaults to the good lyrics IDs file; the run command passes the
+    IDs from the lyric phase directly."""
+    urls_file = ctx.path(URLS_FILE)
+
+    if song_ids is None:
+        # Load the good lyrics song IDs
+        good_lyrics_ids_file = ctx.path(GOOD_LYRICS_IDS_FILE)
+        if not os.path.exists(good_lyrics_ids_file):
+            print(f"Error: Good lyrics song IDs file {good_lyrics_ids_file} not found.")
+            return None
+        song_ids = ctx.song_ids(good_lyrics_ids_file)
+
+    print(f"Found {len(song_ids)} songs with good lyrics to process")
+
+    # Check which songs we've already downloaded to avoid reprocessing
+    ctx.ensure_dirs()
+    processed_ids = downloaded_song_ids(ctx.songs_dir, ctx.staging_dir)
+
+    # Filter out songs that are already downloaded
+    song_ids = [id for id in song_ids if id not in processed_ids]
+    print(f"Remaining songs to download: {len(song_ids)}")
+
+    if not song_ids:
+        print("No new songs to download.")
+        return []
+
+    successful_urls = 0
+    successful_downloads = 0
+    failed_urls = 0
+    songs_data = []
+
+    # Process songs using thread pool
+    print("\nProcessing songs (fetching URLs and downloading)...")
+    retry_queue = DelayedRetryQueue()
+    with tqdm(total=len(song_ids), desc="Processing songs") as pbar:
+        def on_result(song_id, song_data):
+            nonlocal successful_urls, successful_downloads, failed_urls
+            pbar.update(1)
+            pbar.set_postfix(**retry_queue.postfix())
+            if song_data:
+                songs_data.append(song_data)
+                successful_urls += 1
+                successful_downloads += 1
+            else:
+                failed_urls += 1
+
+        run_with_retries(song_ids, lambda song_id: process_song(song_id, ctx),
+                         max_workers, on_result, retry_queue,
+                         on_error=lambda song_id, e: print(f"Error processing song {song_id}: {e}"))
+
+    # Save the URLs data for reference
+    if songs_data:
+        try:
+            with open(urls_file, 'w', encoding='utf-8') as f:
+                json.dump(songs_data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Error saving URLs data: {e}")
+
+    print(f"\nResults:")
+    print(f"- Successfully fetched {successful_urls} download URLs")
+    print(f"- Successfully downloaded {successful_downloads} songs")
+    print(f"- Failed to process {failed_urls} songs")
+    print(f"- URLs saved to {urls_file}")
+    print(f"- Songs saved to {ctx.songs_dir}")
+    for line in ctx.summary():
+        print(f"- {line}")
+
+    return songs_data
@@ -0,0 +1,131 @@
+"""Deduplicated, sorted song ID lists in a compact binary format."""
+import os
+import sys
+import heapq
+import tempfile
+from array import array
+
+# Constants
+RUN_SIZE = 1000000  # IDs sorted in memory before spilling a run to disk
+MERGE_BUFFER = 65536  # IDs read per run at a time while merging
+MAGIC = b'L2SIDS1\0'  # header of the canonical binary ID list
+
+def _to_disk_order(ids):
+    """Canonical files are little-endian uint64, whatever the host byte order."""
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    return ids
+
+def iter_raw_ids(paths):
+    """Stream song IDs as ints from one or more text files, one ID per line."""
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if not line.isdigit():
+                    print(f"Skipping malformed song ID {line!r} in {path}")
+                    continue
+                yield int(line)
+
+def _write_run(ids, tmp_dir):
+    """Sort and deduplicate a batch of IDs and spill it to a temporary run file."""
+    run = _to_disk_order(array('Q', sorted(set(ids))))
+    fd, run_path = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as f:
+        run.tofile(f)
+    return run_path
+
+def _iter_run(run_path):
+    """Read a run file back in fixed-size blocks."""
+    with open(run_path, 'rb') as f:
+        while True:
+            data = f.read(MERGE_BUFFER * 8)
+            if not data:
+                break
+            block = _to_disk_order(array('Q', data))
+            yield from block
+
+def sorted_unique_ids(paths, run_size=RUN_SIZE, tmp_dir=None):
+    """Yield the sorted, deduplicated union of the IDs in the given text files.
+
+    Small inputs are sorted in memory. Larger inputs are split into sorted
+    runs on disk and combined with a k-way merge, so memory use stays bounded
+    by run_size no matter how long the lists are."""
+    run_paths = []
+    batch = []
+    try:
+        for song_id in iter_raw_ids(paths):
+            batch.append(song_id)
+            if len(batch) >= run_size:
+                run_paths.append(_write_run(batch, tmp_dir))
+                batch = []
+
+        if not run_paths:
+            yield from sorted(set(batch))
+            return
+        if batch:
+            run_paths.append(_write_run(batch, tmp_dir))
+        batch = []
+
+        last = None
+        for song_id in heapq.merge(*(_iter_run(p) for p in run_paths)):
+            if song_id != last:
+                yield song_id
+                last = song_id
+    finally:
+        for run_path in run_paths:
+            if os.path.exists(run_path):
+                os.remove(run_path)
+
+def write_id_list(path, sorted_ids):
+    """Write sorted unique IDs to the canonical binary format and return the count."""
+    temp_path = f"{path}.tmp"
+    count = 0
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        block = array('Q')
+        for song_id in sorted_ids:
+            block.append(song_id)
+            if len(block) >= MERGE_BUFFER:
+                _to_disk_order(block).tofile(f)
+                count += len(block)
+                block = array('Q')
+        _to_disk_order(block).tofile(f)
+        count += len(block)
+    os.replace(temp_path, path)
+    return count
+
+def read_id_list(path):
+    """Read a canonical binary ID list as a list of ID strings."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a canonical song ID list")
+        ids = _to_disk_order(array('Q', f.read()))
+    return [str(song_id) for song_id in ids]
+
+def canonical_path(path):
+    """Location of the canonical binary list derived from a text ID file."""
+    return os.path.splitext(path)[0] + '.bin'
+
+def load_song_ids(path):
+    """Load a deduplicated, sorted list of song IDs (as strings).
+
+    Accepts either a canonical .bin list or a text file. For a text file the
+    canonical list next to it is reused while it is up to date, and rebuilt
+    otherwise, so every stage sees the same normalized IDs."""
+    if path.endswith('.bin'):
+        return read_id_list(path)
+
+    bin_path = canonical_path(path)
+    if os.path.exists(bin_path) and os.path.getmtime(bin_path) >= os.path.getmtime(path):
+        return read_id_list(bin_path)
+
+    try:
+        write_id_list(bin_path, sorted_unique_ids([path]))
+    except OSError as e:
+        # Read-only location: normalize in memory instead
+        print(f"Could not write canonical ID list {bin_path}: {e}")
+        return [str(song_id) for song_id in sorted_unique_ids([path])]
+    return read_id_list(bin_path)
@@ -0,0 +1,107 @@
+"""Download integrity: inline hashing and parallel re-verification."""
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .config import SONG_EXTENSIONS
+
+# Constants
+HASH_READ_SIZE = 8 * 1024 * 1024  # large sequential reads keep the HDD streaming
+VERIFY_WORKERS = os.cpu_count() or 4
+
+# Download statuses recorded in the state store
+STATUS_OK = 'ok'  # hash matches the md5 reported by the API
+STATUS_UNVERIFIED = 'unverified'  # no md5 to compare against, size matched or unknown
+STATUS_MISMATCH = 'mismatch'  # hash or size differs from what the API reported
+
+def new_hasher():
+    """Hasher used for downloads; matches the md5 field of /song/url."""
+    return hashlib.md5()
+
+def hash_file(path, read_size=HASH_READ_SIZE):
+    """Hash a file with large sequential reads. Returns (size, md5 hex digest)."""
+    hasher = new_hasher()
+    size = 0
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            block = f.read(read_size)
+            if not block:
+                break
+            hasher.update(block)
+            size += len(block)
+    return size, hasher.hexdigest()
+
+def expected_md5(song_data):
+    """The md5 the API reported for a song, normalized, or None."""
+    md5 = song_data.get('md5')
+    return md5.lower() if md5 else None
+
+def download_status(size, md5, song_data):
+    """Classify a downloaded file against the size and md5 from the API."""
+    expected_size = song_data.get('size')
+    if expected_size is not None and size != expected_size:
+        return STATUS_MISMATCH
+    reference = expected_md5(song_data)
+    if reference is None:
+        return STATUS_UNVERIFIED
+    return STATUS_OK if md5 == reference else STATUS_MISMATCH
+
+def existing_download_ok(song_data, song_path, state):
+    """Check whether an already downloaded file is complete.
+
+    A hash already recorded for the same path and size is reused, so a file
+    is only re-read when nothing is known about it yet."""
+    song_id = song_data['id']
+    size = os.path.getsize(song_path)
+    expected_size = song_data.get('size')
+    if expected_size is not None and size != expected_size:
+        return False
+
+    record = state.get_download(song_id) if state else None
+    if record and record['path'] == song_path and record['size'] == size and record['md5']:
+        md5 = record['md5']
+    else:
+        size, md5 = hash_file(song_path)
+
+    status = download_status(size, md5, song_data)
+    if state:
+        state.record_download(song_id, song_path, size, md5, expected_md5(song_data), status,
+                              song_data.get('br'))
+    return status != STATUS_MISMATCH
+
+def _hash_one(song_id, path):
+    size, md5 = hash_file(path)
+    return song_id, path, size, md5
+
+def verify_songs(songs_dir, state, workers=VERIFY_WORKERS):
+    """Re-hash every audio file in songs_dir in parallel and update the state store.
+
+    Returns a dict counting files per status."""
+    records = {record['song_id']: record for record in state.iter_downloads()}
+    suffixes = tuple(f".{extension}" for extension in SONG_EXTENSIONS)
+    files = [(os.path.splitext(name)[0], os.path.join(songs_dir, name))
+             for name in os.listdir(songs_dir) if name.endswith(suffixes)]
+
+    from tqdm import tqdm
+    
+    counts = {STATUS_OK: 0, STATUS_UNVERIFIED: 0, STATUS_MISMATCH: 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_hash_one, song_id, path) for song_id, path in files]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Verifying songs"):
+            try:
+                song_id, path, size, md5 = future.result()
+            except Exception as e:
+                print(f"Error hashing song file: {e}")
+                continue
+
+            reference = records.get(song_id, {}).get('expected_md5')
+            if reference is None:
+                status = STATUS_UNVERIFIED
+            elif md5 == reference:
+                status = STATUS_OK
+            else:
+                status = STATUS_MISMATCH
+                print(f"Checksum mismatch for song {song_id}: {path}")
+            state.record_download(song_id, path, size, md5, reference, status)
+            counts[status] += 1
+    return counts
@@ -0,0 +1,48 @@
+"""Lyric quality filter."""
+import re
+
+from .config import MIN_LYRIC_LENGTH, MIN_ENGLISH_SEGMENTS
+from .profiling import timed
+
+TIMESTAMP_PATTERN = re.compile(r'\[\d+:\d+\.\d+\]')
+
+def has_non_ascii_characters(text):
+    """Check if the text contains any non-ASCII characters."""
+    return any(ord(char) > 127 for char in text)
+
+@timed('lyric filter')
+def is_good_lyric(lyric_data):
+    """Check if the lyrics meet our criteria for being 'good'.
+    Returns (bool, processed_lyrics) tuple where processed_lyrics contains
+    only the good segments formatted with timestamps."""
+    if not lyric_data or 'lrc' not in lyric_data or not lyric_data['lrc'].get('lyric'):
+        return False, None
+    
+    # Get the main lyrics content
+    lyric_text = lyric_data['lrc']['lyric']
+    
+    # Filter out short lyrics
+    if len(lyric_text) < MIN_LYRIC_LENGTH:
+        return False, None
+    
+    # Split lyrics by timestamp pattern [mm:ss.xx]
+    segments = TIMESTAMP_PATTERN.split(lyric_text)
+    timestamp_matches = TIMESTAMP_PATTERN.findall(lyric_text)
+    
+    # Pair timestamps with segments and remove empty segments
+    paired_segments = []
+    for i in range(min(len(segments), len(timestamp_matches))):
+        if segments[i].strip():
+            paired_segments.append((timestamp_matches[i], segments[i].strip()))
+    
+    # Filter out segments with non-ASCII characters
+    ascii_segments = [(timestamp, text) for timestamp, text in paired_segments 
+                      if not has_non_ascii_characters(text)]
+    
+    # Check if there are enough ASCII segments
+    if len(ascii_segments) < MIN_ENGLISH_SEGMENTS:
+        return False, None
+    
+    # Format the good segments back into lyric format
+    processed_lyrics = '\n'.join(f"{timestamp}{text}" for timestamp, text in ascii_segments)
+    return True, processed_lyrics
@@ -0,0 +1,143 @@
+"""Incremental training manifest of finished lyric + audio pairs.
+
+Each run exports only the songs completed since the previous run, as new
+shards next to the existing ones, and rewrites a small index.json listing
+every shard. Shards are JSON Lines, or Parquet when pyarrow is installed
+(or requested)."""
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import SONG_EXTENSIONS
+
+MANIFEST_DIR = 'manifest'
+SHARD_SIZE = 10000  # songs per shard
+MANIFEST_WORKERS = min(8, os.cpu_count() or 4)
+MANIFEST_FORMATS = ('auto', 'jsonl', 'parquet')
+FLAGGED_PROBE_STATUSES = ('too_short', 'unreadable')  # left out unless include_flagged is set
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _record(song_id, audio_path, lyric_path, probe):
+    with open(lyric_path, 'r', encoding='utf-8') as f:
+        line_count = sum(1 for line in f if line.strip())
+    return {
+        'id': song_id,
+        'audio_path': audio_path,
+        'format': os.path.splitext(audio_path)[1][1:],
+        'bitrate': probe.get('bitrate'),
+        'duration': probe.get('duration'),
+        'size': os.path.getsize(audio_path),
+        'lyric_path': lyric_path,
+        'line_count': line_count,
+    }
+
+def write_shard(path, items, file_format):
+    """Build the records of one shard and write it atomically. Runs in a worker process.
+
+    items holds (song_id, audio_path, lyric_path, probe) tuples. Returns
+    the IDs written; songs whose files vanished are left for a later run."""
+    records = []
+    for song_id, audio_path, lyric_path, probe in items:
+        try:
+            records.append(_record(song_id, audio_path, lyric_path, probe))
+        except OSError:
+            continue
+
+    temp_path = f"{path}.tmp"
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(records), temp_path)
+    else:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(temp_path, path)
+    return [record['id'] for record in records]
+
+def _write_index(manifest_dir, shards):
+    temp_path = os.path.join(manifest_dir, 'index.json.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'updated_at': time.time(), 'songs': sum(shards.values()),
+                   'shards': [{'path': name, 'songs': count} for name, count in sorted(shards.items())]},
+                  f, indent=2)
+    os.replace(temp_path, os.path.join(manifest_dir, 'index.json'))
+
+def export_manifest(ctx, manifest_dir=None, shard_size=SHARD_SIZE, file_format='auto',
+                    workers=MANIFEST_WORKERS, include_flagged=False):
+    """Append shards for the songs completed since the last export.
+
+    A song is complete when it has a lyric file and audio in the song
+    directory. Songs whose probe found them too short or unreadable are
+    left out unless include_flagged is set. Returns the number of songs
+    exported by this run."""
+    manifest_dir = manifest_dir or ctx.path(MANIFEST_DIR)
+    os.makedirs(manifest_dir, exist_ok=True)
+    if file_format == 'auto':
+        file_format = 'parquet' if _parquet_available() else 'jsonl'
+    shard_extension = 'parquet' if file_format == 'parquet' else 'jsonl'
+
+    # Absolute paths, so the manifest can be read from any working directory
+    lyrics_dir = os.path.abspath(ctx.lyrics_dir)
+    songs_dir = os.path.abspath(ctx.songs_dir)
+    lyric_ids = {os.path.splitext(name)[0] for name in os.listdir(lyrics_dir) if name.endswith('.txt')}
+    suffixes = tuple(f".{extension}" for extension in SONG_EXTENSIONS)
+    audio_paths = {os.path.splitext(name)[0]: os.path.join(songs_dir, name)
+                   for name in os.listdir(songs_dir) if name.endswith(suffixes)}
+    complete = lyric_ids & audio_paths.keys()
+
+    probes = {probe['song_id']: probe for probe in ctx.state.iter_probes()}
+    # Songs not probed yet fall back to the bitrate /song/url reported for the download
+    download_bitrates = {record['song_id']: record['bitrate'] for record in ctx.state.iter_downloads()
+                         if record['bitrate']}
+    flagged = set()
+    if not include_flagged:
+        flagged = {song_id for song_id, probe in probes.items() if probe['status'] in FLAGGED_PROBE_STATUSES}
+
+    exported = ctx.state.exported_song_ids()
+    new_ids = sorted(complete - exported - flagged, key=lambda song_id: (len(song_id), song_id))
+    print(f"Found {len(complete)} complete lyric + audio pairs")
+    print(f"- Already in the manifest: {len(complete & exported)}")
+    print(f"- Left out after a failed probe: {len((complete - exported) & flagged)}")
+    print(f"- New songs to export: {len(new_ids)}")
+
+    shards = ctx.state.manifest_shards()
+    if new_ids:
+        from tqdm import tqdm
+
+        # Shard numbers continue after the highest one written so far
+        first = 1 + max((int(name.split('-')[1].split('.')[0]) for name in shards), default=-1)
+        jobs = {}
+        for number, start in enumerate(range(0, len(new_ids), shard_size), first):
+            name = f"part-{number:05d}.{shard_extension}"
+            items = [(song_id, audio_paths[song_id], os.path.join(lyrics_dir, f"{song_id}.txt"),
+                      {'bitrate': probes.get(song_id, {}).get('bitrate') or download_bitrates.get(song_id),
+                       'duration': probes.get(song_id, {}).get('duration')})
+                     for song_id in new_ids[start:start + shard_size]]
+            jobs[name] = items
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(write_shard, os.path.join(manifest_dir, name), items, file_format): name
+                       for name, items in jobs.items()}
+            for future in tqdm(futures, desc="Writing manifest shards"):
+                name = futures[future]
+                try:
+                    song_ids = future.result()
+                except Exception as e:
+                    print(f"Error writing manifest shard {name}: {e}")
+                    continue
+                # Only recorded once the shard file is in place
+                ctx.state.record_manifest_shard(name, song_ids)
+                shards[name] = len(song_ids)
+
+    _write_index(manifest_dir, shards)
+    exported_now = sum(shards.values()) - len(exported)
+    print(f"\nManifest: {sum(shards.values())} songs in {len(shards)} shards in {manifest_dir}")
+    return exported_now
@@ -0,0 +1,343 @@
+"""Memory-mapped, ID-keyed index of the per-song metadata in the metadata package.
+
+The index is one file: a JSON header, fixed-width columns (one array per
+field, row i of every column describing the same song), an open-addressing
+hash table from song ID to row, and a heap of UTF-8 strings that the name
+and artist columns point into. Opening it maps the file without reading
+it; a lookup touches a few pages and column scans run over contiguous
+arrays (vectorized when numpy is installed)."""
+import os
+import glob
+import json
+import mmap
+import struct
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # column scans fall back to pure Python
+    np = None
+
+MAGIC = b'L2SMETA1'
+PARSE_WORKERS = os.cpu_count() or 4
+ALIGNMENT = 8
+
+# (column, array typecode); every column has one value per song
+COLUMNS = (
+    ('id', 'Q'),
+    ('duration_ms', 'I'),  # 0 when unknown
+    ('languages', 'I'),  # bit i set when the song has header['languages'][i]
+    ('name_offset', 'Q'),
+    ('name_length', 'I'),
+    ('artist_offset', 'Q'),
+    ('artist_length', 'I'),
+)
+MAX_LANGUAGES = 32  # bits in the languages column; further languages are not indexed
+
+# Keys tried, in order, for each field of a song's metadata
+NAME_KEYS = ('name', 'song_name', 'title')
+ARTIST_KEYS = ('artist', 'artists', 'ar', 'singer')
+DURATION_KEYS = ('duration', 'dt', 'duration_ms')
+MAX_SECONDS = 10000  # durations below this are taken to be in seconds, not milliseconds
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_EMPTY = 0  # hash table slots hold row + 1
+
+def metadata_files(metadata_path):
+    """All per-song metadata JSON files in the batch*/metadata directories."""
+    files = []
+    for batch_dir in sorted(glob.glob(os.path.join(metadata_path, 'batch*'))):
+        files.extend(sorted(glob.glob(os.path.join(batch_dir, 'metadata', '*.json'))))
+    return files
+
+def _first(song_info, keys):
+    for key in keys:
+        value = song_info.get(key)
+        if value:
+            return value
+    return None
+
+def _artist_text(value):
+    if isinstance(value, list):
+        names = [item.get('name', '') if isinstance(item, dict) else str(item) for item in value]
+        return ' / '.join(name for name in names if name)
+    if isinstance(value, dict):
+        return value.get('name', '')
+    return str(value) if value else ''
+
+def _duration_ms(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0
+    if value < MAX_SECONDS:
+        value *= 1000
+    return min(int(value), 0xFFFFFFFF)
+
+def parse_metadata_file(json_file):
+    """Rows (id, duration_ms, languages, name, artist) for the songs in one file."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    rows = []
+    for song_id, song_info in data.items():
+        if not song_id.isdigit() or not isinstance(song_info, dict):
+            continue
+        languages = song_info.get('language', [])
+        if not isinstance(languages, list):
+            languages = [languages] if languages else []
+        rows.append((int(song_id),
+                     _duration_ms(_first(song_info, DURATION_KEYS)),
+                     [str(language) for language in languages],
+                     str(_first(song_info, NAME_KEYS) or ''),
+                     _artist_text(_first(song_info, ARTIST_KEYS))))
+    return rows
+
+def _slot(song_id, bits):
+    return ((song_id * _HASH_MULTIPLIER) & _MASK64) >> (64 - bits)
+
+class _IdTable:
+    """Open-addressing (linear probing) table from song ID to row, used while building."""
+
+    def __init__(self, ids, bits=16):
+        self.ids = ids
+        self.bits = bits
+        self.slots = array('I', bytes(4 << bits))
+        self.count = 0
+
+    def _find(self, song_id):
+        mask = (1 << self.bits) - 1
+        slot = _slot(song_id, self.bits)
+        while True:
+            entry = self.slots[slot]
+            if entry == _EMPTY or self.ids[entry - 1] == song_id:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        old = self.slots
+        self.bits += 1
+        self.slots = array('I', bytes(4 << self.bits))
+        for entry in old:
+            if entry != _EMPTY:
+                self.slots[self._find(self.ids[entry - 1])] = entry
+
+    def contains(self, song_id):
+        return self.slots[self._find(song_id)] != _EMPTY
+
+    def insert(self, song_id, row):
+        """Add song_id at row; keep the load factor at or below one half."""
+        if (self.count + 1) * 2 > len(self.slots):
+            self._grow()
+        self.slots[self._find(song_id)] = row + 1
+        self.count += 1
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _data_start(header_length):
+    """File offset of the first section: after the magic, header length and header."""
+    return _aligned(len(MAGIC) + 4 + header_length)
+
+def _parse_safely(json_file):
+    try:
+        return parse_metadata_file(json_file), None
+    except Exception as e:
+        return [], str(e)
+
+def build_metadata_index(metadata_path, output_path, workers=PARSE_WORKERS):
+    """Parse every metadata file on a process pool and write the index.
+
+    A song listed in several files keeps its first record. Returns the
+    number of songs indexed."""
+    from tqdm import tqdm
+
+    files = metadata_files(metadata_path)
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    table = _IdTable(columns['id'])
+    languages = {}
+    heap_size = 0
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryFile(dir=output_dir) as heap:
+        def add_string(text):
+            nonlocal heap_size
+            data = text.encode('utf-8')
+            heap.write(data)
+            heap_size += len(data)
+            return heap_size - len(data), len(data)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_parse_safely, files, chunksize=4)
+            for json_file, (rows, error) in tqdm(zip(files, results), total=len(files),
+                                                 desc="Indexing metadata files"):
+                if error:
+                    # Print error but continue with other files
+                    print(f"Error processing {json_file}: {error}")
+                for song_id, duration_ms, song_languages, name, artist in rows:
+                    if table.contains(song_id):
+                        continue
+                    mask = 0
+                    for language in song_languages:
+                        if language not in languages and len(languages) < MAX_LANGUAGES:
+                            languages[language] = len(languages)
+                        if language in languages:
+                            mask |= 1 << languages[language]
+                    row = len(columns['id'])
+                    columns['id'].append(song_id)
+                    columns['duration_ms'].append(duration_ms)
+                    columns['languages'].append(mask)
+                    offset, length = add_string(name)
+                    columns['name_offset'].append(offset)
+                    columns['name_length'].append(length)
+                    offset, length = add_string(artist)
+                    columns['artist_offset'].append(offset)
+                    columns['artist_length'].append(length)
+                    table.insert(song_id, row)
+
+        count = len(columns['id'])
+        header = {
+            'count': count,
+            'table_bits': table.bits,
+            'languages': sorted(languages, key=languages.get),
+            'columns': {},
+        }
+        # Section offsets are relative to the aligned end of the header
+        offset = 0
+        for name, typecode in COLUMNS:
+            header['columns'][name] = [offset, typecode]
+            offset = _aligned(offset + count * columns[name].itemsize)
+        header['table'] = offset
+        offset = _aligned(offset + len(table.slots) * table.slots.itemsize)
+        header['heap'] = [offset, heap_size]
+        header_bytes = json.dumps(header).encode()
+
+        data_start = _data_start(len(header_bytes))
+
+        temp_path = f"{output_path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for name, _ in COLUMNS:
+                f.seek(data_start + header['columns'][name][0])
+                columns[name].tofile(f)
+            f.seek(data_start + header['table'])
+            table.slots.tofile(f)
+            f.seek(data_start + header['heap'][0])
+            heap.seek(0)
+            while True:
+                block = heap.read(1024 * 1024)
+                if not block:
+                    break
+                f.write(block)
+        os.replace(temp_path, output_path)
+    return count
+
+class MetadataIndex:
+    """Read-only view of an index written by build_metadata_index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a metadata index")
+        header_length, = struct.unpack_from('<I', self.map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self.map[start:start + header_length])
+        self.count = self.header['count']
+        self.languages = self.header['languages']
+        self.table_bits = self.header['table_bits']
+        self.view = memoryview(self.map)[_data_start(header_length):]
+        self.columns = {}
+        for name, (offset, typecode) in self.header['columns'].items():
+            itemsize = array(typecode).itemsize
+            self.columns[name] = self.view[offset:offset + self.count * itemsize].cast(typecode)
+        table_offset = self.header['table']
+        self.table = self.view[table_offset:table_offset + (4 << self.table_bits)].cast('I')
+        heap_offset, heap_size = self.header['heap']
+        self.heap = self.view[heap_offset:heap_offset + heap_size]
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, offset, length):
+        return bytes(self.heap[offset:offset + length]).decode('utf-8')
+
+    def row_of(self, song_id):
+        """Row of a song, or None if it is not indexed."""
+        song_id = int(song_id)
+        ids = self.columns['id']
+        mask = (1 << self.table_bits) - 1
+        slot = _slot(song_id, self.table_bits)
+        while True:
+            entry = self.table[slot]
+            if entry == _EMPTY:
+                return None
+            if ids[entry - 1] == song_id:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def record(self, row):
+        columns = self.columns
+        mask = columns['languages'][row]
+        return {
+            'id': str(columns['id'][row]),
+            'name': self._string(columns['name_offset'][row], columns['name_length'][row]),
+            'artist': self._string(columns['artist_offset'][row], columns['artist_length'][row]),
+            'duration_ms': columns['duration_ms'][row] or None,
+            'languages': [language for bit, language in enumerate(self.languages) if mask >> bit & 1],
+        }
+
+    def lookup(self, song_id):
+        """Metadata for a song as a dict, or None if it is not indexed."""
+        row = self.row_of(song_id)
+        return None if row is None else self.record(row)
+
+    def column(self, name):
+        """A whole column: a numpy array when numpy is available, else a memoryview."""
+        if np is not None:
+            return np.frombuffer(self.columns[name], dtype=np.dtype(self.columns[name].format))
+        return self.columns[name]
+
+    def language_mask(self, languages):
+        """Bit mask for the given language names; unknown names match nothing."""
+        mask = 0
+        for language in languages:
+            if language in self.languages:
+                mask |= 1 << self.languages.index(language)
+        return mask
+
+    def scan(self, languages=None, min_duration_ms=None, max_duration_ms=None):
+        """IDs (as strings) of songs with any of the languages and a duration in range."""
+        mask = self.language_mask(languages) if languages else None
+        if languages and not mask:
+            return []
+        if np is not None:
+            keep = np.ones(self.count, dtype=bool)
+            if mask is not None:
+                keep &= (self.column('languages') & mask) != 0
+            durations = self.column('duration_ms')
+            if min_duration_ms is not None:
+                keep &= durations >= min_duration_ms
+            if max_duration_ms is not None:
+                keep &= durations <= max_duration_ms
+            return [str(song_id) for song_id in self.column('id')[keep].tolist()]
+
+        ids = self.columns['id']
+        language_column = self.columns['languages']
+        durations = self.columns['duration_ms']
+        return [str(ids[row]) for row in range(self.count)
+                if (mask is None or language_column[row] & mask)
+                and (min_duration_ms is None or durations[row] >= min_duration_ms)
+                and (max_duration_ms is None or durations[row] <= max_duration_ms)]
+
+    def close(self):
+        for view in (*self.columns.values(), self.table, self.heap, self.view):
+            view.release()
+        self.columns = {}
+        self.map.close()
+        self.file.close()
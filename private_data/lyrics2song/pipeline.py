@@ -0,0 +1,243 @@
+"""Combined phase: fetch lyrics and download the songs whose lyrics pass the filter."""
+import os
+from tqdm import tqdm
+
+from . import tracing
+from .api import get_song_lyric
+from .config import LYRIC_INDEX_FILE, PIPELINE_WORKERS, SAVE_INTERVAL
+from .dedup import DEFAULT_MAX_COPIES, DuplicateFilter, LyricIndex
+from .download import downloaded_song_ids, resolve_and_download, song_exists
+from .lyrics import is_good_lyric
+from .retry import DelayedRetryQueue, RetryLater, run_with_retries
+from .speculation import SpeculativeResolver
+from .tracing import TraceRecorder
+
+def process_song(song_id, ctx, bad_lyrics_ids, no_url_ids, speculation=None, duplicates=None):
+    """Process a single song: fetch lyrics, check quality, and download if good.
+
+    With a SpeculativeResolver, the URL lookup for promising songs runs
+    concurrently with the lyric fetch instead of after it. With a
+    DuplicateFilter, songs past the per-lyric copy cap are not downloaded
+    right away. Returns True for good lyrics, False for bad ones, and None
+    when the lyric API gave no usable answer and the song is undecided."""
+    tracing.event(song_id, 'attempt')
+    # Check if we already have lyrics
+    lyric_path = os.path.join(ctx.lyrics_dir, f"{song_id}.txt")
+
+    # If we already have lyrics (on disk or queued for writing), try to download the song
+    if ctx.writer.exists(lyric_path):
+        # Skip download if song exists or we know it has no URL
+        if (not song_exists(ctx.songs_dir, song_id, ctx.staging_dir) and song_id not in no_url_ids
+                and not (duplicates and duplicates.skipped(song_id))):
+            resolve_and_download(song_id, ctx, no_url_ids=no_url_ids)
+        return True
+
+    # Check if we already know this has bad lyrics
+    if song_id in bad_lyrics_ids:
+        return False
+
+    # Optionally resolve the URL while the lyrics are being fetched
+    speculative_url = speculation.maybe_start(song_id, no_url_ids) if speculation else None
+
+    # Fetch and process lyrics
+    try:
+        with tracing.span(song_id, 'lyric'):
+            lyric_data = get_song_lyric(song_id, ctx.api)
+    except RetryLater:
+        if speculation:
+            speculation.discard(speculative_url)
+        raise
+    if lyric_data:
+        with tracing.span(song_id, 'filter'):
+            is_good, processed_lyrics = is_good_lyric(lyric_data)
+        if speculation:
+            speculation.observe(song_id, is_good)
+        if is_good and processed_lyrics:
+            # Save the processed lyric in the background
+            ctx.writer.write_text(lyric_path, processed_lyrics)
+
+            # Near-duplicates past the copy cap are skipped or left for later
+            if duplicates and not duplicates.admit(song_id, processed_lyrics):
+                if duplicates.mode == 'defer':
+                    # The trace goes on in _download_deferred
+                    tracing.hold(song_id)
+                if speculation:
+                    speculation.discard(speculative_url)
+                return True
+
+            # Immediately try to download the song if not in no_url_ids
+            song_data = None
+            if speculation:
+                with tracing.span(song_id, 'url wait'):
+                    song_data = speculation.take(speculative_url)
+            if song_id not in no_url_ids:
+                resolve_and_download(song_id, ctx, song_data, no_url_ids=no_url_ids)
+            return True
+        else:
+            if speculation:
+                speculation.discard(speculative_url)
+            # Mark as bad lyrics
+            bad_lyrics_ids.add(song_id)
+            return False
+
+    if speculation:
+        speculation.discard(speculative_url)
+    # If we couldn't determine (API error, etc.), don't mark as bad
+    return None
+
+def _download_held_back(song_id, ctx, no_url_ids):
+    tracing.event(song_id, 'attempt')
+    return resolve_and_download(song_id, ctx, no_url_ids=no_url_ids)
+
+def _download_deferred(ctx, song_ids, no_url_ids, max_workers, tracer=None):
+    """Download the near-duplicates that were held back, after everything else.
+
+    Traced songs continue the trace process_song held open for them."""
+    print(f"\nDownloading {len(song_ids)} deferred near-duplicates...")
+    retry_queue = DelayedRetryQueue()
+    with tqdm(total=len(song_ids), desc="Downloading duplicates") as pbar:
+        def on_result(song_id, song_data):
+            pbar.update(1)
+            pbar.set_postfix(**retry_queue.postfix())
+
+        run_with_retries(song_ids,
+                         lambda song_id: _download_held_back(song_id, ctx, no_url_ids),
+                         max_workers, on_result, retry_queue,
+                         on_error=lambda song_id, e: print(f"Error downloading song {song_id}: {e}"),
+                         tracer=tracer)
+
+def combined_pipeline(ctx, english_ids_file, max_workers=PIPELINE_WORKERS, speculative_threshold=None,
+                      dedup_mode=None, max_lyric_copies=DEFAULT_MAX_COPIES, trace_path=None, trace_sample=1.0):
+    """Run the combined pipeline for lyrics and song downloads.
+
+    speculative_threshold enables speculative URL lookups for songs whose
+    estimated chance of good lyrics is at least that value. dedup_mode
+    ('flag', 'skip' or 'defer') enables near-duplicate lyric detection with
+    at most max_lyric_copies downloads per distinct lyric. trace_path
+    enables lifecycle traces for a trace_sample fraction of the songs."""
+    # Create output directories
+    ctx.ensure_dirs()
+
+    if not os.path.exists(english_ids_file):
+        print(f"Error: English song IDs file {english_ids_file} not found.")
+        return False
+
+    all_song_ids = ctx.song_ids(english_ids_file)
+    print(f"Found {len(all_song_ids)} songs to process")
+
+    # Load known bad lyrics and no URL IDs
+    bad_lyrics_ids = ctx.id_set('bad_lyrics')
+    no_url_ids = ctx.id_set('no_url')
+
+    print(f"Found {len(bad_lyrics_ids)} songs with known bad lyrics")
+    print(f"Found {len(no_url_ids)} songs with known unavailable URLs")
+
+    # Count existing good lyrics by scanning directory
+    existing_good_lyrics = {os.path.splitext(f)[0] for f in os.listdir(ctx.lyrics_dir) if f.endswith('.txt')}
+    print(f"Found {len(existing_good_lyrics)} songs with good lyrics")
+
+    # Get songs that have audio downloaded
+    existing_audio = downloaded_song_ids(ctx.songs_dir, ctx.staging_dir)
+    print(f"Found {len(existing_audio)} songs with audio downloaded")
+
+    # A song is fully processed if it either:
+    # 1. Has both lyrics and audio (good song)
+    # 2. Is in bad_lyrics_ids (confirmed bad song)
+    fully_processed = (existing_good_lyrics & existing_audio) | bad_lyrics_ids
+
+    duplicates = None
+    if dedup_mode:
+        duplicate_ids = ctx.id_set('duplicate_lyrics')
+        duplicates = DuplicateFilter(LyricIndex(ctx.path(LYRIC_INDEX_FILE)), dedup_mode,
+                                     max_lyric_copies, duplicate_ids)
+        print(f"Found {len(duplicate_ids)} near-duplicate songs skipped by earlier runs")
+        # 3. Has lyrics that were skipped as a near-duplicate
+        fully_processed |= existing_good_lyrics & duplicate_ids
+
+    # Filter out songs that have been fully processed
+    song_ids_to_process = [id for id in all_song_ids if id not in fully_processed]
+    print(f"Remaining songs to process: {len(song_ids_to_process)}")
+
+    success_count = 0
+    failure_count = 0
+    total_to_process = len(song_ids_to_process)
+    retry_queue = DelayedRetryQueue()
+    speculation = None
+    if speculative_threshold is not None:
+        speculation = SpeculativeResolver(ctx, speculative_threshold, max_workers)
+    tracer = TraceRecorder(trace_path, trace_sample).start() if trace_path else None
+
+    print("\nProcessing songs...")
+
+    try:
+        with tqdm(total=total_to_process, desc="Processing songs") as pbar:
+            def on_result(song_id, result):
+                nonlocal success_count, failure_count
+                if result:
+                    success_count += 1
+                else:
+                    failure_count += 1
+
+                # Update progress
+                pbar.update(1)
+                pbar.set_postfix(good=success_count, bad=failure_count, **retry_queue.postfix())
+
+                # Periodically save IDs
+                if (failure_count + success_count) % SAVE_INTERVAL == 0:
+                    ctx.save_id_set('bad_lyrics')
+                    ctx.save_id_set('no_url')
+                    if duplicates:
+                        ctx.save_id_set('duplicate_lyrics')
+
+            run_with_retries(song_ids_to_process,
+                             lambda song_id: process_song(song_id, ctx, bad_lyrics_ids, no_url_ids,
+                                                          speculation, duplicates),
+                             max_workers, on_result, retry_queue,
+                             on_error=lambda song_id, e: print(f"Error processing song {song_id}: {e}"),
+                             tracer=tracer)
+
+        if duplicates and duplicates.deferred:
+            _download_deferred(ctx, duplicates.deferred, no_url_ids, max_workers, tracer)
+
+    except KeyboardInterrupt:
+        print("\nInterrupted. Saving progress...")
+    finally:
+        if tracer:
+            tracer.close()
+        if speculation:
+            speculation.close()
+        if duplicates:
+            duplicates.index.close()
+            ctx.save_id_set('duplicate_lyrics')
+        # Save the final lists and wait for all queued writes
+        ctx.save_id_set('bad_lyrics')
+        ctx.save_id_set('no_url')
+        ctx.writer.flush()
+
+    # Final count of good lyrics and audio
+    final_good_lyrics = len([f for f in os.listdir(ctx.lyrics_dir) if f.endswith('.txt')])
+    final_good_audio = len(downloaded_song_ids(ctx.songs_dir, ctx.staging_dir))
+
+    print(f"\nResults:")
+    print(f"- Found {final_good_lyrics} songs with good lyrics")
+    print(f"- Found {final_good_audio} songs with audio downloaded")
+    print(f"- Found {len(bad_lyrics_ids)} songs with bad lyrics")
+    print(f"- Found {len(no_url_ids)} songs with unavailable URLs")
+    print(f"- All lyrics saved to {ctx.lyrics_dir}")
+    print(f"- All songs saved to {ctx.songs_dir}")
+    for line in ctx.summary():
+        print(f"- {line}")
+    retry_stats = retry_queue.stats()
+    print(f"- Retried {retry_stats['retries']} attempts, deferred {retry_stats['deferrals']}, "
+          f"gave up on {retry_stats['gave_up']} songs, left {retry_stats['expired']} deferred for the next run")
+    if speculation:
+        for line in speculation.summary():
+            print(f"- {line}")
+    if duplicates:
+        for line in duplicates.summary():
+            print(f"- {line}")
+    if tracer:
+        for line in tracer.summary():
+            print(f"- {line}")
+
+    return True
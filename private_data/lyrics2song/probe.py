@@ -0,0 +1,276 @@
+"""Header-only audio probe: check downloads against the timing of their lyrics.
+
+Duration, codec and bitrate come from container headers only: the first
+MP3 frames (plus a Xing/Info or VBRI header when present), the MP4 moov
+atom, or the FLAC STREAMINFO block. Nothing is decoded, and for MP4 the
+atom tree is walked with seeks, so a probe reads a few KB per file."""
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import SONG_EXTENSIONS
+
+PROBE_WORKERS = os.cpu_count() or 4
+HEADER_READ_SIZE = 64 * 1024  # bytes read after any ID3v2 tag to find the first MP3 frames
+DURATION_TOLERANCE = 5.0  # seconds the audio may end before the last lyric timestamp
+
+# Probe statuses recorded in the state store
+PROBE_OK = 'ok'
+PROBE_TOO_SHORT = 'too_short'  # audio ends well before the last lyric line (previews, clips)
+PROBE_UNREADABLE = 'unreadable'  # no valid MP3/MP4/FLAC header found
+PROBE_NO_LYRIC = 'no_lyric'  # audio is readable but there is no lyric timing to compare
+
+LYRIC_TIMESTAMP = re.compile(r'\[(\d+):(\d+(?:\.\d+)?)\]')
+
+_MP3_BITRATES = {  # kbps by (MPEG-1?, layer)
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+class ProbeError(Exception):
+    """The file does not have a header this module understands."""
+
+def _mp3_frame(header):
+    """Decode a 4-byte MPEG audio frame header, or None if it is not one."""
+    value, = struct.unpack('>I', header)
+    if value >> 21 != 0x7FF:
+        return None
+    version = (value >> 19) & 3  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    layer = 4 - ((value >> 17) & 3)
+    bitrate_index = (value >> 12) & 0xF
+    sample_rate_index = (value >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (value >> 9) & 1
+    mono = ((value >> 6) & 3) == 3
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {'mpeg1': mpeg1, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+            'samples': samples, 'length': length, 'mono': mono}
+
+def _probe_mp3(f, file_size):
+    head = f.read(10)
+    audio_start = 0
+    if head[:3] == b'ID3':
+        # Skip the ID3v2 tag; its size is a 28-bit syncsafe integer
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + size + (10 if head[5] & 0x10 else 0)
+    f.seek(audio_start)
+    data = f.read(HEADER_READ_SIZE)
+
+    # The first frame is the first sync whose successor is also a valid frame
+    for position in range(len(data) - 4):
+        if data[position] != 0xFF or data[position + 1] & 0xE0 != 0xE0:
+            continue
+        frame = _mp3_frame(data[position:position + 4])
+        if frame is None or frame['length'] <= 0:
+            continue
+        following = data[position + frame['length']:position + frame['length'] + 4]
+        if len(following) == 4 and _mp3_frame(following) is None:
+            continue
+        break
+    else:
+        raise ProbeError("no MPEG audio frame found")
+
+    codec = f"mp{frame['layer']}"
+    # Xing/Info sits after the side information; VBRI at a fixed offset of 32
+    side_info = (17 if frame['mono'] else 32) if frame['mpeg1'] else (9 if frame['mono'] else 17)
+    xing = position + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags, = struct.unpack('>I', data[xing + 4:xing + 8])
+        if flags & 1:
+            frames, = struct.unpack('>I', data[xing + 8:xing + 12])
+            duration = frames * frame['samples'] / frame['sample_rate']
+            audio_bytes = file_size - audio_start - position
+            bitrate = int(audio_bytes * 8 / duration) if duration else frame['bitrate']
+            return codec, duration, bitrate, frame['sample_rate']
+    vbri = position + 4 + 32
+    if data[vbri:vbri + 4] == b'VBRI':
+        frames, = struct.unpack('>I', data[vbri + 14:vbri + 18])
+        duration = frames * frame['samples'] / frame['sample_rate']
+        audio_bytes = file_size - audio_start - position
+        bitrate = int(audio_bytes * 8 / duration) if duration else frame['bitrate']
+        return codec, duration, bitrate, frame['sample_rate']
+
+    # Constant bitrate: the duration follows from the size of the audio data
+    audio_bytes = file_size - audio_start - position
+    f.seek(max(0, file_size - 128))
+    if f.read(3) == b'TAG':
+        audio_bytes -= 128
+    return codec, audio_bytes * 8 / frame['bitrate'], frame['bitrate'], frame['sample_rate']
+
+def _mp4_atoms(f, start, end):
+    """Yield (type, payload start, payload end) for the atoms between start and end."""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header)
+        payload = position + 8
+        if size == 1:
+            size, = struct.unpack('>Q', f.read(8))
+            payload += 8
+        elif size == 0:
+            size = end - position
+        if size < payload - position:
+            raise ProbeError(f"invalid MP4 atom size {size}")
+        yield kind, payload, position + size
+        position += size
+
+def _find_mp4_atom(f, start, end, path):
+    for kind, payload, atom_end in _mp4_atoms(f, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return payload, atom_end
+            if kind in _MP4_CONTAINERS:
+                found = _find_mp4_atom(f, payload, atom_end, path[1:])
+                if found:
+                    return found
+    return None
+
+def _probe_mp4(f, file_size):
+    moov = _find_mp4_atom(f, 0, file_size, [b'moov'])
+    if moov is None:
+        raise ProbeError("no moov atom")
+    mvhd = _find_mp4_atom(f, moov[0], moov[1], [b'mvhd'])
+    if mvhd is None:
+        raise ProbeError("no mvhd atom")
+    f.seek(mvhd[0])
+    version = f.read(4)[0]
+    if version == 1:
+        _, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+    else:
+        _, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+    if not timescale:
+        raise ProbeError("mvhd timescale is zero")
+    duration = duration / timescale
+
+    codec, sample_rate = 'mp4', None
+    stsd = _find_mp4_atom(f, moov[0], moov[1], [b'trak', b'mdia', b'minf', b'stbl', b'stsd'])
+    if stsd is not None:
+        # Skip version/flags and entry count; the first sample entry names the codec
+        f.seek(stsd[0] + 8)
+        entry = f.read(36)
+        if len(entry) == 36:
+            codec = entry[4:8].decode('latin-1').strip() or codec
+            # Audio sample entries keep the rate as 16.16 fixed point at byte 32
+            sample_rate = struct.unpack('>I', entry[32:36])[0] >> 16 or None
+    bitrate = int(file_size * 8 / duration) if duration else None
+    return codec, duration, bitrate, sample_rate
+
+def _probe_flac(f, file_size):
+    f.seek(4)
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        raise ProbeError("FLAC stream does not start with STREAMINFO")
+    info = f.read(34)
+    if len(info) < 34:
+        raise ProbeError("truncated STREAMINFO")
+    packed, = struct.unpack('>Q', info[10:18])
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise ProbeError("FLAC sample rate is zero")
+    duration = total_samples / sample_rate
+    bitrate = int(file_size * 8 / duration) if duration else None
+    return 'flac', duration, bitrate, sample_rate
+
+def probe_audio(path):
+    """Return (codec, duration seconds, bitrate, sample rate) from the file's headers.
+
+    The container is recognized from its first bytes, not the extension."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        magic = f.read(12)
+        f.seek(0)
+        if magic[:4] == b'fLaC':
+            return _probe_flac(f, file_size)
+        if magic[4:8] == b'ftyp':
+            return _probe_mp4(f, file_size)
+        return _probe_mp3(f, file_size)
+
+def last_lyric_time(lyric_path):
+    """Time in seconds of the last timestamped lyric line, or None."""
+    try:
+        with open(lyric_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+    times = [int(minutes) * 60 + float(seconds) for minutes, seconds in LYRIC_TIMESTAMP.findall(text)]
+    return max(times) if times else None
+
+def probe_song(song_id, song_path, lyric_path, tolerance=DURATION_TOLERANCE):
+    """Probe one song and compare it with its lyrics. Runs in a worker process."""
+    size = 0
+    lyric_end = last_lyric_time(lyric_path)
+    try:
+        size = os.path.getsize(song_path)
+        codec, duration, bitrate, sample_rate = probe_audio(song_path)
+    except (ProbeError, struct.error, OSError, IndexError) as e:
+        return {'song_id': song_id, 'path': song_path, 'size': size, 'codec': None, 'duration': None,
+                'bitrate': None, 'sample_rate': None, 'lyric_end': lyric_end,
+                'status': PROBE_UNREADABLE, 'error': str(e)}
+    if lyric_end is None:
+        status = PROBE_NO_LYRIC
+    elif duration + tolerance < lyric_end:
+        status = PROBE_TOO_SHORT
+    else:
+        status = PROBE_OK
+    return {'song_id': song_id, 'path': song_path, 'size': size, 'codec': codec, 'duration': duration,
+            'bitrate': bitrate, 'sample_rate': sample_rate, 'lyric_end': lyric_end,
+            'status': status, 'error': None}
+
+def _probe_batch(batch):
+    return [probe_song(*item) for item in batch]
+
+def probe_songs(songs_dir, lyrics_dir, state, workers=PROBE_WORKERS, reprobe=False, batch_size=64):
+    """Probe downloaded songs on a process pool and record the results in the state store.
+
+    Songs already probed at the same path and size are skipped unless
+    reprobe is set. Returns a dict counting songs per status."""
+    from tqdm import tqdm
+
+    known = set() if reprobe else {(probe['path'], probe['size']) for probe in state.iter_probes()}
+    suffixes = tuple(f".{extension}" for extension in SONG_EXTENSIONS)
+    items = []
+    for name in os.listdir(songs_dir):
+        if not name.endswith(suffixes):
+            continue
+        song_path = os.path.join(songs_dir, name)
+        if (song_path, os.path.getsize(song_path)) in known:
+            continue
+        song_id = os.path.splitext(name)[0]
+        items.append((song_id, song_path, os.path.join(lyrics_dir, f"{song_id}.txt")))
+
+    # Hand out songs in batches so the per-task overhead stays small next to the I/O
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    counts = {PROBE_OK: 0, PROBE_TOO_SHORT: 0, PROBE_UNREADABLE: 0, PROBE_NO_LYRIC: 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(items), desc="Probing songs") as pbar:
+        for results in executor.map(_probe_batch, batches):
+            for result in results:
+                state.record_probe(result)
+                counts[result['status']] += 1
+                if result['status'] == PROBE_TOO_SHORT:
+                    print(f"Song {result['song_id']} is {result['duration']:.1f}s long but its lyrics "
+                          f"run to {result['lyric_end']:.1f}s")
+                elif result['status'] == PROBE_UNREADABLE:
+                    print(f"Song {result['song_id']} is unreadable: {result['error']}")
+            pbar.update(len(results))
+    return counts
@@ -0,0 +1,198 @@
+"""Sampling profiler and per-stage CPU/wall timers for --profile runs.
+
+A background thread samples the stack of every thread at a fixed rate, so
+its cost depends on the rate and not on how many calls the pipeline makes;
+at 10 Hz or less it is cheap enough to leave on for production runs.
+Samples are written as folded stacks, the input of flamegraph.pl,
+speedscope and inferno. Hot spots are also timed explicitly with stage()
+and timed(), which record wall and thread CPU time per named stage while a
+profiler runs and cost a single check otherwise; loops over many small
+operations time them locally and report the sum with add_stage(). Only the
+main process is sampled; process pools (verify, probe, manifest, metadata)
+are not."""
+import os
+import re
+import sys
+import time
+import threading
+import functools
+import contextlib
+from collections import Counter
+
+PROFILE_HZ = 100  # samples per second; 10 or less for long production runs
+MAX_DEPTH = 128  # frames kept per sampled stack
+REPORT_FUNCTIONS = 25  # functions listed in the end-of-run report
+IDLE_FRAMES = ('thread.py:_worker',)  # leaf frame of an executor thread waiting for work
+
+_THREAD_NUMBER = re.compile(r'\d+')  # worker-3 and worker-7 fold into one root
+_NO_STAGE = contextlib.nullcontext()
+
+_active = None  # the running SamplingProfiler, if any
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'wall', 'cpu')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_stage(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+def stage(name):
+    """Context manager timing a named stage while a profiler runs; a no-op otherwise."""
+    profiler = _active
+    if profiler is None:
+        return _NO_STAGE
+    return _Stage(profiler, name)
+
+def enabled():
+    """Whether a profiler is running."""
+    return _active is not None
+
+def add_stage(name, wall, cpu):
+    """Add time measured by the caller to a stage, e.g. the sum of many small writes."""
+    profiler = _active
+    if profiler is not None:
+        profiler.add_stage(name, wall, cpu)
+
+def timed(name):
+    """Decorator timing every call of a function as the named stage."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            with _Stage(profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class SamplingProfiler:
+    """Sample all thread stacks every 1/hz seconds and collect stage timings.
+
+    Sample counts are thread-seconds divided by the interval: a worker
+    waiting on a socket is counted like one running Python code, so idle
+    and blocked time shows up under the wait it is spent in."""
+
+    def __init__(self, hz=PROFILE_HZ, max_depth=MAX_DEPTH):
+        self.hz = hz
+        self.interval = 1.0 / hz
+        self.max_depth = max_depth
+        self.stacks = Counter()  # tuple of frame labels, outermost first -> samples
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.lock = threading.Lock()
+        self.stages = {}  # name -> [calls, wall seconds, CPU seconds]
+        self.labels = {}  # code object -> frame label
+        self.stopped = threading.Event()
+        self.thread = None
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def start(self):
+        global _active
+        self.started_at = time.perf_counter()
+        self.cpu_at = time.process_time()
+        self.thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self.thread.start()
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        if _active is self:
+            _active = None
+        self.stopped.set()
+        self.thread.join()
+        self.wall = time.perf_counter() - self.started_at
+        self.cpu = time.process_time() - self.cpu_at
+
+    def add_stage(self, name, wall, cpu):
+        with self.lock:
+            totals = self.stages.get(name)
+            if totals is None:
+                totals = self.stages[name] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            label = self.labels[code] = f"{os.path.basename(code.co_filename)}:{name}"
+        return label
+
+    def _sample(self, own_ident):
+        names = {thread.ident: _THREAD_NUMBER.sub('N', thread.name) for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, 'thread'))
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            start = time.perf_counter()
+            self._sample(own_ident)
+            self.sampling_time += time.perf_counter() - start
+
+    def write_folded(self, path):
+        """Write the samples as folded stacks ("root;caller;callee count" per line)."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+        os.replace(temp_path, path)
+
+    def idle_time(self):
+        """Thread-seconds spent by pool threads waiting for work."""
+        return sum(count for stack, count in self.stacks.items() if stack[-1] in IDLE_FRAMES) * self.interval
+
+    def function_times(self):
+        """{frame label: (cumulative seconds, self seconds)}, estimated from the samples.
+
+        Samples of idle pool threads are left out."""
+        cumulative = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            if stack[-1] in IDLE_FRAMES:
+                continue
+            # Recursive functions count once per sample; the root is the thread name
+            for label in set(stack[1:]):
+                cumulative[label] += count
+            own[stack[-1]] += count
+        return {label: (count * self.interval, own[label] * self.interval)
+                for label, count in cumulative.items()}
+
+    def summary(self, functions=REPORT_FUNCTIONS):
+        overhead = self.sampling_time / self.wall if self.wall else 0
+        lines = [f"Profile: {self.samples} samples at {self.hz:g} Hz over {self.wall:.1f}s wall, "
+                 f"{self.cpu:.1f}s CPU; sampling took {self.sampling_time:.2f}s ({overhead:.1%})"]
+        with self.lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1][1])
+        for name, (calls, wall, cpu) in stages:
+            lines.append(f"Stage {name}: {calls} calls, {wall:.2f}s wall, {cpu:.2f}s CPU "
+                         f"({cpu / wall if wall else 0:.0%} on CPU), {wall / calls * 1000:.2f} ms per call")
+        times = sorted(self.function_times().items(), key=lambda item: -item[1][0])
+        if times:
+            lines.append(f"Top {min(functions, len(times))} functions by cumulative thread-seconds (self), "
+                         f"not counting {self.idle_time():.1f}s of idle pool threads:")
+            for label, (total, own) in times[:functions]:
+                lines.append(f"  {total:10.2f}s ({own:.2f}s) {label}")
+        return lines
@@ -0,0 +1,61 @@
+"""Audio quality policy for URL resolution and per-format byte accounting."""
+import threading
+from collections import defaultdict
+
+# Constants
+DEFAULT_MAX_BR = 320000  # highest MP3 tier; /song/url defaults to 999000 (lossless where available)
+FALLBACK_BR = 128000  # standard tier, served as MP3 for almost every song
+DEFAULT_FORMATS = ('mp3', 'm4a')
+
+class QualityPolicy:
+    """Target audio quality for URL resolution, plus per-format byte accounting.
+
+    max_br is passed to /song/url as the br parameter, so the API resolves the
+    best stream at or below it. When the stream it picks is not in one of the
+    preferred formats, the URL is requested once more at FALLBACK_BR."""
+
+    def __init__(self, max_br=DEFAULT_MAX_BR, formats=DEFAULT_FORMATS):
+        self.max_br = max_br
+        self.formats = tuple(fmt.lower() for fmt in formats)
+        self.lock = threading.Lock()
+        self.downloads = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.bitrate_sum = defaultdict(int)
+        self.downgrades = 0
+
+    def downgrade(self, song_data, br):
+        """Return a lower bitrate to request instead, or None to accept song_data."""
+        file_type = (song_data.get('type') or 'mp3').lower()
+        if file_type in self.formats or br <= FALLBACK_BR:
+            return None
+        with self.lock:
+            self.downgrades += 1
+        return FALLBACK_BR
+
+    def record_download(self, song_data, size):
+        """Account the bytes of a finished download under its format."""
+        file_type = (song_data.get('type') or 'mp3').lower()
+        with self.lock:
+            self.downloads[file_type] += 1
+            self.bytes[file_type] += size
+            self.bitrate_sum[file_type] += song_data.get('br') or 0
+
+    def summary(self):
+        """Human-readable lines with downloads, bytes and average bitrate per format."""
+        lines = []
+        with self.lock:
+            for file_type in sorted(self.bytes, key=self.bytes.get, reverse=True):
+                count = self.downloads[file_type]
+                total_mb = self.bytes[file_type] / (1024 * 1024)
+                avg_mb = total_mb / count
+                avg_kbps = self.bitrate_sum[file_type] / count / 1000
+                lines.append(f"{file_type}: {count} songs, {total_mb:.1f} MB "
+                             f"({avg_mb:.2f} MB/song, {avg_kbps:.0f} kbps avg)")
+            if self.downgrades:
+                lines.append(f"Re-requested {self.downgrades} URLs at {FALLBACK_BR // 1000} kbps "
+                             f"to avoid non-preferred formats")
+        return lines
+
+def parse_formats(value):
+    """Parse a comma-separated list of preferred formats."""
+    return tuple(fmt.strip().lower() for fmt in value.split(',') if fmt.strip())
@@ -0,0 +1,226 @@
+"""Delayed retries that do not hold a worker thread while waiting."""
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .config import MAX_RETRIES, RETRY_DELAY
+
+MAX_RETRY_DELAY = 60  # seconds, cap for exponential backoff
+IN_FLIGHT_PER_WORKER = 2  # submitted-but-unfinished items per worker thread
+MAX_DEFERRED_TIME = 15 * 60  # seconds an item may keep being deferred before it is left for the next run
+
+class RetryLater(Exception):
+    """A single attempt failed for a reason that may go away (timeouts, 5xx, ...).
+
+    stage names the call that failed (e.g. '/lyric' or 'download'). Attempts
+    are counted per stage, so an item that makes several calls gets
+    max_attempts at each of them."""
+
+    def __init__(self, message, stage=None):
+        super().__init__(message)
+        self.stage = stage
+
+class Deferred(RetryLater):
+    """The item was not attempted (e.g. a stage is paused); try again after delay seconds.
+
+    Deferrals do not count against the item's attempts, but an item still
+    deferred max_deferred_time seconds after its first deferral is given up
+    so that a stage that never resumes cannot keep the run alive."""
+
+    def __init__(self, message, delay, stage=None):
+        super().__init__(message, stage)
+        self.delay = delay
+
+class DelayedRetryQueue:
+    """Items waiting for their next attempt, ordered by due time.
+
+    Each item keeps its own backoff state per stage: the n-th retry of an
+    item at a stage becomes due base_delay * 2**(n-1) seconds (with jitter,
+    capped at max_delay) after its last failure. Items that fail
+    max_attempts times at the same stage, or are still deferred
+    max_deferred_time seconds after their first deferral, are dropped."""
+
+    def __init__(self, base_delay=RETRY_DELAY, max_delay=MAX_RETRY_DELAY, max_attempts=MAX_RETRIES,
+                 max_deferred_time=MAX_DEFERRED_TIME):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.max_deferred_time = max_deferred_time
+        self.lock = threading.Lock()
+        self.heap = []
+        self.seq = 0
+        self.attempts = {}  # item -> {stage: failed attempts}
+        self.first_failure = {}  # item -> when it was first retried or deferred
+        self.first_deferral = {}
+        self.retries = 0
+        self.deferrals = 0
+        self.gave_up = 0
+        self.expired = 0  # items given up while deferred
+
+    def schedule(self, item, stage=None):
+        """Schedule another attempt for item after a failure at stage.
+
+        Returns False when the item has used up its attempts at that stage."""
+        now = time.monotonic()
+        with self.lock:
+            stages = self.attempts.setdefault(item, {})
+            failures = stages.get(stage, 0) + 1
+            if failures >= self.max_attempts:
+                self._forget(item)
+                self.gave_up += 1
+                return False
+            stages[stage] = failures
+            self.first_failure.setdefault(item, now)
+            delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+            delay *= random.uniform(0.8, 1.2)
+            self.seq += 1
+            heapq.heappush(self.heap, (now + delay, self.seq, item))
+            self.retries += 1
+        return True
+
+    def defer(self, item, delay):
+        """Put an item back without counting a failed attempt.
+
+        Returns False when the item has been deferred for max_deferred_time."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.first_deferral.setdefault(item, now) >= self.max_deferred_time:
+                self._forget(item)
+                self.expired += 1
+                return False
+            self.first_failure.setdefault(item, now)
+            self.seq += 1
+            heapq.heappush(self.heap, (now + delay, self.seq, item))
+            self.deferrals += 1
+        return True
+
+    def pop_ready(self, limit=None):
+        """Remove and return items whose retry is due, oldest due first."""
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now and (limit is None or len(ready) < limit):
+                ready.append(heapq.heappop(self.heap)[2])
+        return ready
+
+    def next_due_in(self):
+        """Seconds until the next retry is due, or None if nothing is waiting."""
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, self.heap[0][0] - time.monotonic())
+
+    def _forget(self, item):
+        self.attempts.pop(item, None)
+        self.first_failure.pop(item, None)
+        self.first_deferral.pop(item, None)
+
+    def done(self, item):
+        """Forget the backoff state of an item that finished."""
+        with self.lock:
+            self._forget(item)
+
+    def attempts_for(self, item):
+        """Failed attempts so far for an item, over all stages."""
+        with self.lock:
+            return sum(self.attempts.get(item, {}).values())
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+    def stats(self):
+        """Waiting items, total retries and deferrals, items given up, and age of the oldest one waiting."""
+        now = time.monotonic()
+        with self.lock:
+            waiting = [self.first_failure[item] for _, _, item in self.heap if item in self.first_failure]
+            return {
+                'waiting': len(self.heap),
+                'retries': self.retries,
+                'deferrals': self.deferrals,
+                'gave_up': self.gave_up,
+                'expired': self.expired,
+                'oldest_age': now - min(waiting) if waiting else 0.0,
+            }
+
+    def postfix(self):
+        """Short stats for a tqdm postfix."""
+        stats = self.stats()
+        return {'retrying': stats['waiting'], 'oldest': f"{stats['oldest_age']:.0f}s"}
+
+def run_with_retries(items, func, max_workers, on_result, retry_queue=None, on_error=None, tracer=None):
+    """Run func(item) for every item on a thread pool.
+
+    An attempt that raises RetryLater goes onto the delayed-retry queue and
+    its worker moves straight on to the next ready item; one that raises
+    Deferred is requeued without using up an attempt. on_result(item,
+    result) is called once per item: with func's return value, or with None
+    when the item failed permanently, ran out of attempts or stayed
+    deferred too long. A tracer
+    (tracing.TraceRecorder) is told when items are first queued, retried
+    and finished."""
+    if retry_queue is None:
+        retry_queue = DelayedRetryQueue()
+    pending = iter(items)
+    exhausted = False
+    in_flight = {}
+    limit = max_workers * IN_FLIGHT_PER_WORKER
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # Ready retries go first, then new items, until the pool is full
+            for item in retry_queue.pop_ready(limit - len(in_flight)):
+                in_flight[executor.submit(func, item)] = item
+            while not exhausted and len(in_flight) < limit:
+                try:
+                    item = next(pending)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if tracer:
+                    tracer.queued(item)
+                in_flight[executor.submit(func, item)] = item
+
+            if not in_flight:
+                delay = retry_queue.next_due_in()
+                if delay is None:
+                    break
+                time.sleep(delay)
+                continue
+
+            # With every slot taken a due retry cannot start anyway; waking up
+            # for it would only spin until a slot frees up
+            timeout = retry_queue.next_due_in() if len(in_flight) < limit else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Deferred as e:
+                    if tracer:
+                        tracer.retry(item, e, deferred=True)
+                    if retry_queue.defer(item, e.delay):
+                        continue
+                    if retry_queue.expired == 1:
+                        print(f"Leaving deferred items for the next run after "
+                              f"{retry_queue.max_deferred_time / 60:.0f} minutes: {e}")
+                    result = None
+                except RetryLater as e:
+                    if tracer:
+                        tracer.retry(item, e)
+                    if retry_queue.schedule(item, e.stage):
+                        continue
+                    print(f"Giving up on {item} after {retry_queue.max_attempts} attempts: {e}")
+                    result = None
+                except Exception as e:
+                    if on_error:
+                        on_error(item, e)
+                    else:
+                        print(f"Error processing {item}: {e}")
+                    result = None
+                retry_queue.done(item)
+                on_result(item, result)
+                if tracer:
+                    tracer.finish(item, result)
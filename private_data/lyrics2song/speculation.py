@@ -0,0 +1,124 @@
+"""Speculative /song/url lookups that overlap the /lyric request."""
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import get_song_url
+from .config import PIPELINE_WORKERS
+from .retry import RetryLater
+
+PRIOR_WEIGHT = 20  # pseudo-observations pulling a bucket toward the global rate
+BUCKET_PREFIX = 3  # leading ID digits that define a bucket (IDs are roughly chronological)
+
+class GoodLyricEstimator:
+    """Running estimate of the chance that a song's lyrics pass the filter.
+
+    Songs are bucketed by ID length and leading digits, which tracks upload
+    era. Each bucket's rate is smoothed toward the global rate so sparse
+    buckets start from a sensible value."""
+
+    def __init__(self, prior_weight=PRIOR_WEIGHT):
+        self.prior_weight = prior_weight
+        self.lock = threading.Lock()
+        self.good = defaultdict(int)
+        self.total = defaultdict(int)
+        self.global_good = 0
+        self.global_total = 0
+
+    @staticmethod
+    def _bucket(song_id):
+        return f"{len(song_id)}:{song_id[:BUCKET_PREFIX]}"
+
+    def estimate(self, song_id):
+        bucket = self._bucket(song_id)
+        with self.lock:
+            global_rate = (self.global_good + 1) / (self.global_total + 2)
+            return ((self.good[bucket] + self.prior_weight * global_rate)
+                    / (self.total[bucket] + self.prior_weight))
+
+    def observe(self, song_id, is_good):
+        bucket = self._bucket(song_id)
+        with self.lock:
+            self.total[bucket] += 1
+            self.global_total += 1
+            if is_good:
+                self.good[bucket] += 1
+                self.global_good += 1
+
+class SpeculativeResolver:
+    """Start URL lookups alongside lyric fetches for likely-good songs.
+
+    A lookup is launched only when the estimator puts the song's chance of
+    good lyrics at or above the threshold. Its result is used if the lyrics
+    pass and dropped otherwise; the counts of both are kept so the threshold
+    can be tuned against the extra API load. The pool should be as large as
+    the pipeline's, or lookups queue behind each other and a lyric that
+    passes waits longer than a plain lookup would take."""
+
+    def __init__(self, ctx, threshold, max_workers=PIPELINE_WORKERS):
+        self.ctx = ctx
+        self.threshold = threshold
+        self.estimator = GoodLyricEstimator()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speculative-url')
+        self.lock = threading.Lock()
+        self.launched = 0
+        self.skipped = 0
+        self.used = 0
+        self.no_url = 0
+        self.wasted = 0
+        self.failed = 0
+
+    def _count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def maybe_start(self, song_id, no_url_ids):
+        """Launch a URL lookup for song_id if it looks promising. Returns a future or None."""
+        if song_id in no_url_ids or self.estimator.estimate(song_id) < self.threshold:
+            self._count('skipped')
+            return None
+        self._count('launched')
+        return self.executor.submit(get_song_url, song_id, self.ctx.api, self.ctx.quality, no_url_ids)
+
+    def observe(self, song_id, is_good):
+        self.estimator.observe(song_id, is_good)
+
+    def take(self, future):
+        """Result of a speculative lookup whose lyrics passed, or None to resolve normally."""
+        if future is None:
+            return None
+        if future.cancel():
+            # Still queued: resolving inline is quicker than waiting for a free lookup thread
+            with self.lock:
+                self.launched -= 1
+            return None
+        try:
+            song_data = future.result()
+        except RetryLater:
+            self._count('failed')
+            return None
+        self._count('used' if song_data else 'no_url')
+        return song_data
+
+    def discard(self, future):
+        """Drop a speculative lookup whose lyrics failed or could not be fetched."""
+        if future is None:
+            return
+        if future.cancel():
+            # Never reached the API
+            with self.lock:
+                self.launched -= 1
+            return
+        self._count('wasted')
+
+    def summary(self):
+        with self.lock:
+            lines = [f"Speculative URL lookups: {self.launched} launched, {self.used} used, "
+                     f"{self.no_url} without a URL, {self.wasted} wasted, {self.failed} failed, "
+                     f"{self.skipped} skipped (threshold {self.threshold:.2f})"]
+            if self.launched:
+                lines.append(f"Speculation hit rate: {self.used / self.launched:.1%}")
+        return lines
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,161 @@
+"""Local staging directory for downloads, migrated to the song directory in batches."""
+import os
+import time
+import shutil
+import threading
+
+from .config import SONG_EXTENSIONS
+from .retry import Deferred
+
+STAGING_HIGH_WATERMARK = 20 * 1024**3  # bytes staged before new downloads are deferred
+MIGRATION_BATCH_BYTES = 512 * 1024**2  # bytes collected before a batch is migrated
+MIGRATION_INTERVAL = 10  # seconds; a partial batch is migrated after this long
+STAGING_POLL_INTERVAL = 5  # seconds a download deferred by a full staging directory waits
+
+class StagingArea:
+    """Finish downloads on fast local disk and move them to songs_dir in the background.
+
+    Many concurrent streams written straight to a spinning disk turn into
+    random writes. Here they land in staging_dir, and one mover thread copies
+    completed files to songs_dir one after another, in batches of about
+    MIGRATION_BATCH_BYTES. While more than high_watermark bytes are staged,
+    downloads are deferred and the mover migrates without waiting for a
+    full batch. Files whose move fails stay staged and are tried again with
+    the next batch."""
+
+    def __init__(self, staging_dir, songs_dir, state, high_watermark=STAGING_HIGH_WATERMARK,
+                 batch_bytes=MIGRATION_BATCH_BYTES, interval=MIGRATION_INTERVAL):
+        self.staging_dir = staging_dir
+        self.songs_dir = songs_dir
+        self.state = state
+        self.high_watermark = high_watermark
+        self.batch_bytes = batch_bytes
+        self.interval = interval
+        self.cond = threading.Condition()
+        self.pending = []
+        self.pending_bytes = 0
+        self.staged_bytes = 0
+        self.migrated = 0
+        self.migrated_bytes = 0
+        self.failures = 0
+        self.moving = False
+        self.batches = 0
+        self.flushing = 0
+        self.closing = False
+
+        os.makedirs(staging_dir, exist_ok=True)
+        self.same_device = os.stat(staging_dir).st_dev == os.stat(songs_dir).st_dev
+        self._recover()
+        self.thread = threading.Thread(target=self._mover_loop, name='staging-mover', daemon=True)
+        self.thread.start()
+
+    def _recover(self):
+        """Queue completed files left in staging by a previous run; drop partial ones."""
+        suffixes = tuple(f".{extension}" for extension in SONG_EXTENSIONS)
+        for name in sorted(os.listdir(self.staging_dir)):
+            path = os.path.join(self.staging_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+            elif name.endswith(suffixes):
+                self.add(os.path.splitext(name)[0], path, os.path.getsize(path))
+
+    def staged_path(self, song_id, file_type):
+        return os.path.join(self.staging_dir, f"{song_id}.{file_type}")
+
+    def check_space(self, song_id):
+        """Raise Deferred while staging is above its high watermark."""
+        with self.cond:
+            if self.staged_bytes >= self.high_watermark and not self.closing:
+                self.cond.notify_all()
+                raise Deferred(f"download of song {song_id} deferred: staging directory is full "
+                               f"({self.staged_bytes / 1024**3:.1f} GiB)", STAGING_POLL_INTERVAL)
+
+    def add(self, song_id, staged_path, size):
+        """Queue a completed download for migration."""
+        with self.cond:
+            self.pending.append((song_id, staged_path, size))
+            self.pending_bytes += size
+            self.staged_bytes += size
+            if self.pending_bytes >= self.batch_bytes:
+                self.cond.notify_all()
+
+    def _take_batch(self):
+        with self.cond:
+            deadline = time.monotonic() + self.interval
+            while (not self.closing and not self.flushing and self.pending_bytes < self.batch_bytes
+                   and self.staged_bytes < self.high_watermark):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch = sorted(self.pending, key=lambda item: item[1])
+            self.pending = []
+            self.pending_bytes = 0
+            self.moving = True
+            return batch
+
+    def _migrate(self, song_id, staged_path, size):
+        final_path = os.path.join(self.songs_dir, os.path.basename(staged_path))
+        if self.same_device:
+            os.replace(staged_path, final_path)
+        else:
+            temp_path = f"{final_path}.tmp"
+            shutil.copyfile(staged_path, temp_path)
+            os.replace(temp_path, final_path)
+            os.remove(staged_path)
+        self.state.update_download_path(song_id, staged_path, final_path)
+
+    def _mover_loop(self):
+        while True:
+            batch = self._take_batch()
+            failed = 0
+            for song_id, staged_path, size in batch:
+                try:
+                    self._migrate(song_id, staged_path, size)
+                except Exception as e:
+                    print(f"Error migrating staged song {song_id}: {e}")
+                    failed += 1
+                    # Keep it staged and try again with the next batch
+                    with self.cond:
+                        self.pending.append((song_id, staged_path, size))
+                        self.pending_bytes += size
+                    continue
+                with self.cond:
+                    self.staged_bytes -= size
+                    self.migrated += 1
+                    self.migrated_bytes += size
+            with self.cond:
+                self.failures += failed
+                self.moving = False
+                self.batches += 1
+                self.cond.notify_all()
+                # Files that failed again are left for the next run to recover
+                if self.closing and (not self.pending or failed):
+                    return
+                if failed:
+                    # Back off instead of retrying a failing disk in a tight loop
+                    self.cond.wait(self.interval)
+
+    def flush(self):
+        """Migrate everything staged so far and wait until the mover is done with it."""
+        with self.cond:
+            # A batch being moved now misses files added since; the one after it takes them
+            target = self.batches + (2 if self.moving else 1)
+            self.flushing += 1
+            self.cond.notify_all()
+            while self.batches < target and self.thread.is_alive():
+                self.cond.wait(1)
+            self.flushing -= 1
+
+    def summary(self):
+        with self.cond:
+            return [f"Migrated {self.migrated} songs ({self.migrated_bytes / 1024**2:.1f} MB) "
+                    f"from {self.staging_dir}, {self.staged_bytes / 1024**2:.1f} MB still staged, "
+                    f"{self.failures} failed moves"]
+
+    def close(self):
+        """Migrate everything still staged and stop the mover."""
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
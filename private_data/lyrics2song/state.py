@@ -0,0 +1,138 @@
+"""SQLite store for per-song pipeline results."""
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    song_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    md5 TEXT,
+    expected_md5 TEXT,
+    status TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    bitrate INTEGER
+);
+CREATE TABLE IF NOT EXISTS probes (
+    song_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    codec TEXT,
+    duration REAL,
+    bitrate INTEGER,
+    sample_rate INTEGER,
+    lyric_end REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifest (
+    song_id TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    exported_at REAL NOT NULL
+);
+"""
+
+PROBE_KEYS = ('song_id', 'path', 'size', 'codec', 'duration', 'bitrate', 'sample_rate',
+              'lyric_end', 'status', 'error')
+
+class StateStore:
+    """Per-song pipeline results kept in a SQLite file next to the outputs.
+
+    A single connection is shared by all worker threads and serialized with
+    a lock; writes are small and infrequent compared to network I/O."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(downloads)')}
+        if 'bitrate' not in columns:
+            # State files written before the bitrate was recorded
+            self.conn.execute('ALTER TABLE downloads ADD COLUMN bitrate INTEGER')
+
+    def record_download(self, song_id, path, size, md5, expected_md5, status, bitrate=None):
+        """Record the outcome of downloading or re-hashing a song file.
+
+        bitrate is the one /song/url reported; re-hashing without it keeps
+        the recorded value."""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO downloads '
+                '(song_id, path, size, md5, expected_md5, status, checked_at, bitrate) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(song_id) DO UPDATE SET path = excluded.path, size = excluded.size, '
+                'md5 = excluded.md5, expected_md5 = excluded.expected_md5, status = excluded.status, '
+                'checked_at = excluded.checked_at, bitrate = COALESCE(excluded.bitrate, downloads.bitrate)',
+                (str(song_id), path, size, md5, expected_md5, status, time.time(), bitrate))
+
+    def update_download_path(self, song_id, old_path, new_path):
+        """Point a download record at the file's new location after it was moved."""
+        with self.lock:
+            self.conn.execute('UPDATE downloads SET path = ? WHERE song_id = ? AND path = ?',
+                              (new_path, str(song_id), old_path))
+
+    def get_download(self, song_id):
+        """Return the last recorded download result for a song, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT song_id, path, size, md5, expected_md5, status, checked_at, bitrate '
+                'FROM downloads WHERE song_id = ?', (str(song_id),)).fetchone()
+        if row is None:
+            return None
+        keys = ('song_id', 'path', 'size', 'md5', 'expected_md5', 'status', 'checked_at', 'bitrate')
+        return dict(zip(keys, row))
+
+    def iter_downloads(self):
+        """Return all recorded download results."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT song_id, path, size, md5, expected_md5, status, bitrate FROM downloads').fetchall()
+        keys = ('song_id', 'path', 'size', 'md5', 'expected_md5', 'status', 'bitrate')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def record_probe(self, probe):
+        """Record the header probe of a song file (a dict with PROBE_KEYS)."""
+        with self.lock:
+            self.conn.execute(
+                f'INSERT OR REPLACE INTO probes ({", ".join(PROBE_KEYS)}, checked_at) '
+                f'VALUES ({", ".join("?" * len(PROBE_KEYS))}, ?)',
+                (*(probe[key] for key in PROBE_KEYS), time.time()))
+
+    def iter_probes(self, status=None):
+        """Return all recorded probes, or only those with the given status."""
+        query = f'SELECT {", ".join(PROBE_KEYS)} FROM probes'
+        params = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            params = (status,)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(zip(PROBE_KEYS, row)) for row in rows]
+
+    def record_manifest_shard(self, shard, song_ids):
+        """Record that a manifest shard containing song_ids was written."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR REPLACE INTO manifest (song_id, shard, exported_at) VALUES (?, ?, ?)',
+                                  [(str(song_id), shard, now) for song_id in song_ids])
+            self.conn.execute('COMMIT')
+
+    def exported_song_ids(self):
+        """IDs of all songs already in a manifest shard."""
+        with self.lock:
+            return {row[0] for row in self.conn.execute('SELECT song_id FROM manifest')}
+
+    def manifest_shards(self):
+        """Songs per manifest shard, keyed by shard file name."""
+        with self.lock:
+            return dict(self.conn.execute('SELECT shard, COUNT(*) FROM manifest GROUP BY shard').fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,234 @@
+"""Per-song lifecycle traces of the combined pipeline, and their analysis.
+
+While a TraceRecorder is active, every sampled song collects timestamped
+events from the moment it is queued until its final result: each attempt,
+the lyric request, the filter, the URL request, the download (with the
+time spent in disk writes) and every retry or deferral. A song whose
+download is held back for a later pass (near-duplicates with --dedup-lyrics
+defer) keeps its trace open until that pass is done. Finished songs are
+appended to a JSON Lines file, one compact record per song:
+
+    {"id": "123", "start": 1718000000.0, "result": true, "total": 812.4,
+     "events": [["queued", 0], ["attempt", 0.2], ["lyric", 0.3, 20.1], ...]}
+
+Event times are milliseconds since the song was queued; spans carry their
+duration as a third element and failures a fourth. Sampling is decided by
+a hash of the song ID, so the same songs are traced on every run and node."""
+import json
+import math
+import time
+import zlib
+import threading
+import contextlib
+
+PERCENTILES = (50, 99)
+SLOWEST_SONGS = 20
+
+_NO_SPAN = contextlib.nullcontext()
+
+_active = None  # the recording TraceRecorder, if any
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+class _Span:
+    __slots__ = ('events', 'start_time', 'name', 'started')
+
+    def __init__(self, events, start_time, name):
+        self.events = events
+        self.start_time = start_time
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event = [self.name, _ms(self.started - self.start_time), _ms(time.time() - self.started)]
+        if exc_type is not None:
+            event.append(type(exc).__name__)
+        self.events.append(event)
+        return False
+
+def span(song_id, name):
+    """Context manager recording a stage of a traced song; a no-op for other songs."""
+    recorder = _active
+    trace = recorder.songs.get(song_id) if recorder is not None else None
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace['events'], trace['start'], name)
+
+def traced(song_id):
+    """Whether events of song_id are being recorded."""
+    recorder = _active
+    return recorder is not None and song_id in recorder.songs
+
+def hold(song_id):
+    """Keep the trace of song_id open past its result; a later pass queues it again."""
+    recorder = _active
+    trace = recorder.songs.get(song_id) if recorder is not None else None
+    if trace is not None:
+        event(song_id, 'held')
+        trace['held'] = True
+
+def event(song_id, name, duration=None, detail=None):
+    """Record a point event (or, with duration in seconds, one that just ended) for a traced song."""
+    recorder = _active
+    trace = recorder.songs.get(song_id) if recorder is not None else None
+    if trace is None:
+        return
+    now = time.time()
+    if duration is None:
+        entry = [name, _ms(now - trace['start'])]
+    else:
+        entry = [name, _ms(now - duration - trace['start']), _ms(duration)]
+    if detail is not None:
+        entry.extend([None] * (3 - len(entry)) + [detail])
+    trace['events'].append(entry)
+
+class TraceRecorder:
+    """Collect lifecycle events of a sample of songs and append them to a JSONL file.
+
+    Install it with start() so the stages of the pipeline can reach it;
+    run_with_retries reports queueing, retries and results through
+    queued(), retry() and finish()."""
+
+    def __init__(self, path, sample_rate=1.0):
+        self.path = path
+        self.threshold = int(max(0.0, min(1.0, sample_rate)) * 0xFFFFFFFF)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+        self.songs = {}  # song ID -> trace being recorded
+        self.written = 0
+
+    def sampled(self, song_id):
+        return zlib.crc32(str(song_id).encode()) <= self.threshold
+
+    def start(self):
+        global _active
+        _active = self
+        return self
+
+    def queued(self, song_id):
+        """A song was handed to the worker pool for the first time.
+
+        A held song continues its open trace instead of starting a new one."""
+        if song_id not in self.songs and self.sampled(song_id):
+            self.songs[song_id] = {'start': time.time(), 'events': [['queued', 0.0]]}
+
+    def retry(self, song_id, error, deferred=False):
+        """An attempt failed with RetryLater (or was deferred) and the song was put back."""
+        event(song_id, 'deferred' if deferred else 'retry', detail=str(error))
+
+    def finish(self, song_id, result):
+        """A song got its final result; write its trace unless it is held.
+
+        Any truthy result (e.g. a URL record) is written as good."""
+        trace = self.songs.get(song_id)
+        if trace is None or trace.pop('held', False):
+            return
+        del self.songs[song_id]
+        self._write(song_id, trace, None if result is None else bool(result))
+
+    def _write(self, song_id, trace, result):
+        record = {'id': song_id, 'start': round(trace['start'], 3), 'result': result,
+                  'total': _ms(time.time() - trace['start']), 'events': trace['events']}
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.written += 1
+
+    def summary(self):
+        return [f"Traced {self.written} songs to {self.path}"]
+
+    def close(self):
+        """Stop recording; songs still in flight are written with result "unfinished"."""
+        global _active
+        if _active is self:
+            _active = None
+        for song_id, trace in list(self.songs.items()):
+            self._write(song_id, trace, 'unfinished')
+        self.songs.clear()
+        with self.lock:
+            self.file.close()
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _result_label(result):
+    """good, bad, failed or unfinished; older traces may hold a whole URL record."""
+    if result is None:
+        return 'failed'
+    if isinstance(result, str):
+        return result
+    return 'good' if result else 'bad'
+
+def _stage_times(record):
+    """{stage: total ms} for one song.
+
+    Besides the spans this counts the wait before the first attempt, the
+    backoff between a retry (or deferral) and the next attempt, and the
+    time a held song waits for its later pass."""
+    times = {}
+    waiting = 'queue wait'
+    since = 0.0
+    for e in record['events']:
+        if e[0] in ('retry', 'deferred', 'held'):
+            waiting, since = f"{e[0]} wait", e[1]
+        elif e[0] == 'attempt' and waiting:
+            times[waiting] = times.get(waiting, 0.0) + e[1] - since
+            waiting = None
+        elif len(e) > 2 and e[2] is not None:
+            times[e[0]] = times.get(e[0], 0.0) + e[2]
+    return times
+
+def analyze_trace(path, slowest=SLOWEST_SONGS):
+    """Report lines: p50/p99 per stage, retry counts and the slowest songs with their breakdown."""
+    stage_values = {}
+    retries = {}
+    totals = []
+    results = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            result = _result_label(record['result'])
+            results[result] = results.get(result, 0) + 1
+            times = _stage_times(record)
+            for name, value in times.items():
+                stage_values.setdefault(name, []).append(value)
+            for e in record['events']:
+                if e[0] in ('retry', 'deferred'):
+                    retries[e[0]] = retries.get(e[0], 0) + 1
+            totals.append((record['total'], record['id'], result, times))
+
+    if not totals:
+        return [f"No traced songs in {path}"]
+    lines = [f"{len(totals)} traced songs: " + ', '.join(f"{count} {result}" for result, count in
+                                                         sorted(results.items()))]
+    lines.append(f"Retries: {retries.get('retry', 0)}, deferrals: {retries.get('deferred', 0)}")
+    all_totals = sorted(total for total, _, _, _ in totals)
+    header = ' '.join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    lines.append(f"{'stage (ms)':<14} {'songs':>8} {header} {'max':>10}")
+    lines.append(f"{'total':<14} {len(all_totals):>8} "
+                 + ' '.join(f"{percentile(all_totals, p):>10.1f}" for p in PERCENTILES)
+                 + f" {all_totals[-1]:>10.1f}")
+    for name, values in sorted(stage_values.items(), key=lambda item: -percentile(sorted(item[1]), 99)):
+        values.sort()
+        lines.append(f"{name:<14} {len(values):>8} "
+                     + ' '.join(f"{percentile(values, p):>10.1f}" for p in PERCENTILES)
+                     + f" {values[-1]:>10.1f}")
+
+    lines.append(f"Slowest {min(slowest, len(totals))} songs (ms):")
+    totals.sort(key=lambda item: -item[0])
+    for total, song_id, result, times in totals[:slowest]:
+        breakdown = ', '.join(f"{name} {value:.0f}" for name, value in
+                              sorted(times.items(), key=lambda item: -item[1]))
+        lines.append(f"  {song_id} ({result}): {total:.0f} total; {breakdown}")
+    return lines
@@ -0,0 +1,139 @@
+"""Background writer for lyric files and ID-set checkpoints."""
+import os
+import queue
+import threading
+
+from .profiling import stage
+
+WRITE_BATCH = 256  # files written per batch at most
+WRITE_INTERVAL = 1.0  # seconds a queued write may wait for its batch to fill
+FSYNC_POLICIES = ('none', 'batch', 'always')
+
+_STOP = object()
+
+class BackgroundWriter:
+    """Write small files from one thread so workers never block on the disk.
+
+    Workers queue lyric texts and ID-set snapshots; the writer thread groups
+    them into batches of up to WRITE_BATCH files. Each file is written to a
+    temporary name and renamed into place, so a crash never leaves a partial
+    lyric behind. Only the newest snapshot of an ID set in a batch is
+    written. The fsync policy decides durability:
+
+    - none: leave flushing to the OS
+    - batch: fsync each file, and its directory once per batch
+    - always: fsync each file and its directory as soon as it is written"""
+
+    def __init__(self, fsync='none', batch_size=WRITE_BATCH, interval=WRITE_INTERVAL):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = {}  # path -> text queued but not written yet
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name='background-writer', daemon=True)
+        self.thread.start()
+
+    def write_text(self, path, text):
+        """Queue text to be written to path."""
+        with self.lock:
+            self.pending[path] = text
+        self.queue.put((path, text))
+
+    def write_lines(self, path, lines):
+        """Queue a file with one line per item, e.g. a snapshot of an ID set."""
+        self.write_text(path, ''.join(f"{line}\n" for line in lines))
+
+    def exists(self, path):
+        """Whether path exists on disk or is queued to be written."""
+        with self.lock:
+            if path in self.pending:
+                return True
+        return os.path.exists(path)
+
+    def _write_file(self, path, text):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if self.fsync != 'none':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        if self.fsync == 'always':
+            self._sync_dirs([path])
+
+    def _sync_dirs(self, paths):
+        for directory in {os.path.dirname(path) or '.' for path in paths}:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _write_batch(self, batch):
+        # Later writes to the same path replace earlier ones
+        files = dict(batch)
+        for path, text in files.items():
+            try:
+                with stage('background write'):
+                    self._write_file(path, text)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error writing {path}: {e}")
+        if self.fsync == 'batch':
+            try:
+                self._sync_dirs(files)
+            except OSError as e:
+                print(f"Error syncing directories: {e}")
+        with self.lock:
+            for path, text in files.items():
+                if self.pending.get(path) is text:
+                    del self.pending[path]
+        self.written += len(files)
+        self.batches += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch = []
+            waiters = []
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=self.interval)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for event in waiters:
+                event.set()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until everything queued so far is on disk (per the fsync policy)."""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def summary(self):
+        return [f"Background writer: {self.written} files in {self.batches} batches "
+                f"(fsync={self.fsync}), {self.errors} errors"]
+
+    def close(self):
+        """Write everything still queued and stop the writer thread."""
+        self.queue.put(_STOP)
+        self.thread.join()